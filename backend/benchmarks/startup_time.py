@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+import urllib.request
+import urllib.error
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def status(url: str) -> int:
+    """
+    Status of GET request to the url, 0 if the server doesn't accept connections yet
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError):
+        return 0
+
+
+def measure(port: int, timeout: float) -> dict:
+    """
+    Start the service and measure time until it accepts connections and until it is ready
+
+    Parameters
+    ----------
+    port: int
+        Port for the service
+    timeout: float
+        Maximum time in seconds to wait for the readiness
+
+    Returns
+    -------
+    dict
+        {'alive': seconds, 'ready': seconds}
+    """
+    url = f'http://localhost:{port}/ready'
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, 'main.py'], cwd=BACKEND_DIR, env=dict(os.environ, PORT=str(port)),
+                              stdout=subprocess.DEVNULL)
+    timings = {}
+    try:
+        while time.perf_counter() - start < timeout:
+            code = status(url)
+            if code and 'alive' not in timings:
+                timings['alive'] = time.perf_counter() - start
+            if code == 200:
+                timings['ready'] = time.perf_counter() - start
+                break
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of service startup time')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    for run in range(args.runs):
+        timings = measure(args.port, args.timeout)
+        print(f"run {run}: alive in {timings.get('alive', float('nan')):.3f}s, "
+              f"ready in {timings.get('ready', float('nan')):.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,6 @@
-from logistic.logistic_optimizer import LogisticOptimizer
+def __getattr__(name):
+    # ortools is imported only when the optimizer is really used (in solver workers)
+    if name == 'LogisticOptimizer':
+        from logistic.logistic_optimizer import LogisticOptimizer
+        return LogisticOptimizer
+    raise AttributeError(f"module 'logistic' has no attribute '{name}'")
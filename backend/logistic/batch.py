@@ -0,0 +1,217 @@
+import os
+import asyncio
+import cProfile
+from typing import List, Tuple, Dict, Union
+from collections import defaultdict
+
+import numpy as np
+
+from logistic.config import MODE_CONVERTER, PROFILE_DIR
+
+
+def problem_mode(problem: Dict) -> str:
+    """
+    Transport of a problem in routing API format
+
+    Parameters
+    ----------
+    problem: Dict
+        Problem in REST format with 'central_store', 'stores' and 'couriers' keys
+
+    Returns
+    -------
+    str
+        Mode of the first courier. Example: 'driving-car'
+    """
+    return MODE_CONVERTER[problem['couriers'][0]['transport']]
+
+
+def problem_locations(problem: Dict) -> List[Tuple[float, float]]:
+    """
+    Locations of a problem in the same order as ``LogisticOptimizer.total_locations``
+
+    Parameters
+    ----------
+    problem: Dict
+        Problem in REST format with 'central_store', 'stores' and 'couriers' keys
+
+    Returns
+    -------
+    List[Tuple[float, float]]
+        Depots locations followed by stores locations in (lat, lon) format
+    """
+    depots = problem['central_store']
+    if not isinstance(depots, list):
+        depots = [depots]
+    stores = problem['stores']
+    if isinstance(stores, dict):
+        stores_locations = list(zip(np.asarray(stores['lat'], dtype=float).tolist(),
+                                    np.asarray(stores['lon'], dtype=float).tolist()))
+    else:
+        stores_locations = [tuple(store['location']) for store in stores]
+    return [tuple(depot['location']) for depot in depots] + stores_locations
+
+
+async def shared_road_weights(problems: List[Dict],
+                              routing_manager: object
+                              ) -> Tuple[List[Union[np.ndarray, None]],
+                                         List[Union[np.ndarray, None]],
+                                         List[Union[Exception, None]]]:
+    """
+    Calculate weights and road distances for several problems.
+    Pairs of locations are shared between problems with the same transport: every problem queries only
+    pairs of its locations that are not queried for previous problems (e.g. legs from a shared depot
+    or between shared stores). All queries are sent concurrently.
+
+    Parameters
+    ----------
+    problems: List[Dict]
+        Problems in REST format with 'central_store', 'stores' and 'couriers' keys
+    routing_manager: object
+        Client for the routing API (``logistic.ors.ORS``)
+
+    Returns
+    -------
+    Tuple[List[Union[np.ndarray, None]], List[Union[np.ndarray, None]], List[Union[Exception, None]]]
+        Duration and road distance matrices for every problem in ``LogisticOptimizer.duration_matrix`` format,
+        None for problems with 'approximation' flag, which are solved on approximated durations,
+        and error of every problem which is malformed or which matrix query failed (None for the rest).
+        Road distances are queried only if some problem has 'metrics' flag, they are None otherwise
+    """
+    weights, distances, errors = [None] * len(problems), [None] * len(problems), [None] * len(problems)
+    # road distances are needed only for metrics
+    with_distances = any(isinstance(problem, dict) and problem.get('metrics') for problem in problems)
+
+    # index of query of every pair of locations by transport
+    pair_queries = defaultdict(dict)
+    # queries: (transport, sources, destinations)
+    queries = []
+    # transport, locations and indexes of needed queries of every problem
+    problems_queries = {}
+    for index, problem in enumerate(problems):
+        try:
+            if problem.get('approximation'):
+                continue
+            mode, locations = problem_mode(problem), problem_locations(problem)
+        except (KeyError, TypeError, ValueError, AttributeError, IndexError) as error:
+            errors[index] = error
+            continue
+
+        points = list(dict.fromkeys(locations))
+        known = pair_queries[mode]
+        missing = defaultdict(list)
+        for point_1 in points:
+            for point_2 in points:
+                if point_1 != point_2 and (point_1, point_2) not in known:
+                    missing[point_1].append(point_2)
+        # sources missing the same destinations are queried together, so only missing pairs are queried.
+        # Sources missing all other points are queried to all points, so a new problem is one square block
+        sources_by_destinations = defaultdict(list)
+        for point_1, destinations in missing.items():
+            destinations = points if len(destinations) == len(points) - 1 else destinations
+            sources_by_destinations[tuple(destinations)].append(point_1)
+        for destinations, sources in sources_by_destinations.items():
+            for point_1 in sources:
+                for point_2 in destinations:
+                    known.setdefault((point_1, point_2), len(queries))
+            queries.append((mode, sources, list(destinations)))
+        problems_queries[index] = (mode, locations, {known[(point_1, point_2)] for point_1 in points
+                                                     for point_2 in points if point_1 != point_2})
+
+    returns = await asyncio.gather(*[routing_manager.matrix_calculation(sources, mode, with_distances, destinations)
+                                     for mode, sources, destinations in queries], return_exceptions=True)
+
+    mode_weights, mode_distances = defaultdict(dict), defaultdict(dict)
+    for (mode, _, _), ret in zip(queries, returns):
+        if not isinstance(ret, Exception):
+            mode_weights[mode].update(ret[0])
+            if with_distances:
+                mode_distances[mode].update(ret[1])
+
+    for index, (mode, locations, needed) in problems_queries.items():
+        failed = [returns[query] for query in needed if isinstance(returns[query], Exception)]
+        if failed:
+            errors[index] = failed[0]
+            continue
+        # different nodes can share location (e.g. depot and store), there is nothing to move between them
+        weights[index] = np.array([[0 if point_1 == point_2 else mode_weights[mode][(point_1, point_2)]
+                                    for point_2 in locations] for point_1 in locations], dtype=float)
+        if with_distances:
+            distances[index] = np.array([[0 if point_1 == point_2 else mode_distances[mode][(point_1, point_2)]
+                                          for point_2 in locations] for point_1 in locations], dtype=float)
+    return weights, distances, errors
+
+
+def solve_problem(problem: Dict,
+                  duration_matrix: np.ndarray,
+                  distance_matrix: np.ndarray = None,
+                  request_id: str = None
+                  ) -> Dict[str, Union[List[Dict], List[Dict]]]:
+    """
+    Solve one problem with already calculated weights.
+    Function is executed in solver worker processes, so it doesn't query routing API and
+    returns solution without detailed routes (see ``logistic.logistic_optimizer.add_detailed_routes``)
+
+    Parameters
+    ----------
+    problem: Dict
+        Problem in REST format with 'central_store', 'stores' and 'couriers' keys
+    duration_matrix: np.ndarray
+        Durations between problem locations, approximated by the solver if it is None
+    distance_matrix: np.ndarray
+        Road distances between problem locations, used only for metrics if problem has 'metrics' flag
+    request_id: str
+        Id of the request. If problem has 'profile' flag and PROFILE_DIR is set,
+        cProfile stats of the solve are dumped to PROFILE_DIR/<request_id>.prof
+
+    Returns
+    -------
+    Dict[str, Union[List[Dict], List[Dict]]]
+        Solution in ``LogisticOptimizer.decode_solution`` format
+    """
+    from logistic.logistic_optimizer import LogisticOptimizer
+
+    model = LogisticOptimizer(central_store=problem['central_store'],
+                              stores=problem['stores'],
+                              couriers=problem['couriers'],
+                              approximation=duration_matrix is None)
+    if duration_matrix is not None:
+        model.duration_matrix = duration_matrix
+    model.distance_matrix = distance_matrix
+
+    def solve():
+        return model.solve(with_metrics=bool(problem.get('metrics')),
+                           instrumentation=bool(problem.get('instrumentation')))
+
+    if not (problem.get('profile') and PROFILE_DIR and request_id):
+        return solve()
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(solve)
+    finally:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile.dump_stats(os.path.join(PROFILE_DIR, f'{request_id}.prof'))
+
+
+def warm_up_solver() -> int:
+    """
+    Solve a tiny problem with all dimensions to import and initialize OR-Tools in a solver worker process.
+    Used as initializer of solver workers, so the first real request doesn't pay for it
+
+    Returns
+    -------
+    int
+        Id of the warmed up process
+    """
+    from logistic.logistic_optimizer import LogisticOptimizer
+
+    central_store = {'location': (50.45, 30.51), 'time_window': [0, 10000]}
+    stores = [{'location': (50.46, 30.49), 'demand': 1, 'time_window': [0, 10000]},
+              {'location': (50.47, 30.50), 'demand': 1}]
+    model = LogisticOptimizer(central_store=central_store,
+                              stores=stores,
+                              couriers=[{'pid': 0, 'transport': 'driving', 'capacity': 2}],
+                              approximation=True)
+    model.solve(with_metrics=True)
+    return os.getpid()
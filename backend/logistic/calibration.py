@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import uuid
+from functools import lru_cache
+from collections import defaultdict
+from typing import List, Dict, Iterator, Tuple, Union
+
+import numpy as np
+
+from logistic.config import MODE_TO_SPEED, MODE_CONVERTER, SPEED_MODEL_PATH
+from logistic.utils import haversine_matrix
+
+# upper bounds of straight line distance bands in kilometers, the last band is unbounded
+DISTANCE_BANDS = [1, 3, 10, 30]
+# size of region grid cells in degrees
+GRID_SIZE = 0.05
+# minimal amount of samples to trust speed of a region cell and distance band
+MIN_CELL_SAMPLES = 20
+
+
+class MatrixStore(object):
+
+    def __init__(self, directory: str):
+        """
+        Storage of routing API duration matrices used for calibration of approximation
+
+        Parameters
+        ----------
+        directory: str
+            Directory with matrices in NPZ format
+        """
+        self.directory = directory
+
+    def save(self,
+             sources: List[Tuple[float, float]],
+             destinations: List[Tuple[float, float]],
+             durations: np.ndarray,
+             mode: str):
+        """
+        Save matrix
+
+        Parameters
+        ----------
+        sources: List[Tuple[float, float]]
+            Points in (lat, lon) format of matrix rows
+        destinations: List[Tuple[float, float]]
+            Points in (lat, lon) format of matrix columns
+        durations: np.ndarray
+            Durations between points in seconds from routing API, NaN for unreachable pairs
+        mode: str
+            Transport in routing API format. Example: 'driving-car'
+        """
+        os.makedirs(os.path.join(self.directory, mode), exist_ok=True)
+        np.savez_compressed(os.path.join(self.directory, mode, f'{uuid.uuid4().hex}.npz'),
+                            sources=np.asarray(sources, dtype=float),
+                            destinations=np.asarray(destinations, dtype=float),
+                            durations=np.asarray(durations, dtype=float))
+
+    def matrices(self, mode: str) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Stored matrices of the transport
+
+        Parameters
+        ----------
+        mode: str
+            Transport in routing API format. Example: 'driving-car'
+
+        Returns
+        -------
+        Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+            Sources with (n, 2) shape, destinations with (m, 2) shape and durations with (n, m) shape
+            (NaN for unreachable pairs)
+        """
+        directory = os.path.join(self.directory, mode)
+        if not os.path.isdir(directory):
+            return
+        for file_name in sorted(os.listdir(directory)):
+            with np.load(os.path.join(directory, file_name)) as matrix:
+                if 'points' in matrix:
+                    # square matrices stored before rectangular ones were supported
+                    yield matrix['points'], matrix['points'], matrix['durations']
+                else:
+                    yield matrix['sources'], matrix['destinations'], matrix['durations']
+
+    def modes(self) -> List[str]:
+        """
+        Transports with stored matrices
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(mode for mode in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, mode)))
+
+
+class SpeedModel(object):
+
+    def __init__(self,
+                 band_speeds: List[float],
+                 cell_speeds: Dict[Tuple[int, int], List[Union[float, None]]],
+                 distance_bands: List[float] = DISTANCE_BANDS,
+                 grid_size: float = GRID_SIZE):
+        """
+        Model of effective speed (straight line distance divided by road duration) by distance band and region
+
+        Parameters
+        ----------
+        band_speeds: List[float]
+            Speed in km/s for every distance band
+        cell_speeds: Dict[Tuple[int, int], List[Union[float, None]]]
+            Speed in km/s for every distance band of region grid cells with enough samples, None if band has few samples
+        distance_bands: List[float]
+            Upper bounds of distance bands in kilometers
+        grid_size: float
+            Size of region grid cells in degrees
+        """
+        self.band_speeds = np.asarray(band_speeds, dtype=float)
+        self.cell_speeds = cell_speeds
+        self.distance_bands = np.asarray(distance_bands, dtype=float)
+        self.grid_size = grid_size
+
+        # speed table: a row for every cell and the last row for unknown cells
+        self._cells = {cell: i for i, cell in enumerate(cell_speeds)}
+        table = np.array([[np.nan if speed is None else speed for speed in speeds] for speeds in cell_speeds.values()]
+                         + [[np.nan] * len(self.band_speeds)], dtype=float).reshape(-1, len(self.band_speeds))
+        self._table = np.where(np.isnan(table), self.band_speeds, table)
+
+    def cells(self, points: np.ndarray) -> np.ndarray:
+        """
+        Grid cells of points with (n, 2) shape
+        """
+        return np.floor(np.asarray(points, dtype=float) / self.grid_size).astype(int)
+
+    def duration_matrix(self, points: np.ndarray) -> np.ndarray:
+        """
+        Approximate durations of movement between every pair of points
+
+        Parameters
+        ----------
+        points: np.ndarray
+            Points in (lat, lon) format with (n, 2) shape
+
+        Returns
+        -------
+        np.ndarray
+            Durations in seconds with (n, n) shape
+        """
+        distances = haversine_matrix(points)
+        bands = np.digitize(distances, self.distance_bands)
+        rows = np.array([self._cells.get(tuple(cell), len(self._cells)) for cell in self.cells(points).tolist()],
+                        dtype=int)
+        return distances / self._table[rows[:, None], bands]
+
+    def to_dict(self) -> dict:
+        return {
+            'band_speeds': self.band_speeds.tolist(),
+            'cell_speeds': [[list(cell), speeds] for cell, speeds in self.cell_speeds.items()],
+            'distance_bands': self.distance_bands.tolist(),
+            'grid_size': self.grid_size
+        }
+
+    @classmethod
+    def from_dict(cls, model: dict) -> 'SpeedModel':
+        return cls(band_speeds=model['band_speeds'],
+                   cell_speeds={tuple(cell): speeds for cell, speeds in model['cell_speeds']},
+                   distance_bands=model['distance_bands'],
+                   grid_size=model['grid_size'])
+
+
+def fit_speed_model(matrices: Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                    default_speed: float,
+                    distance_bands: List[float] = DISTANCE_BANDS,
+                    grid_size: float = GRID_SIZE,
+                    min_cell_samples: int = MIN_CELL_SAMPLES) -> SpeedModel:
+    """
+    Fit speed model on routing API matrices: median effective speed for every distance band,
+    and for every band of region cells (by origin point) with enough samples
+
+    Parameters
+    ----------
+    matrices: Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+        Sources, destinations and durations between them (see ``MatrixStore.matrices``)
+    default_speed: float
+        Speed in km/s for distance bands without samples
+    distance_bands: List[float]
+        Upper bounds of distance bands in kilometers
+    grid_size: float
+        Size of region grid cells in degrees
+    min_cell_samples: int
+        Minimal amount of samples to trust speed of a region cell and distance band
+
+    Returns
+    -------
+    SpeedModel
+    """
+    model = SpeedModel([default_speed] * (len(distance_bands) + 1), {}, distance_bands, grid_size)
+
+    speeds, bands, cells = [], [], []
+    for sources, destinations, durations in matrices:
+        distances = haversine_matrix(sources, destinations)
+        valid = (distances > 0) & np.isfinite(durations) & (durations > 0)
+        origins = np.broadcast_to(model.cells(sources)[:, None, :], durations.shape + (2,))
+        speeds.append(distances[valid] / durations[valid])
+        bands.append(np.digitize(distances[valid], model.distance_bands))
+        cells.append(origins[valid])
+    if not speeds:
+        return model
+    speeds, bands, cells = np.concatenate(speeds), np.concatenate(bands), np.concatenate(cells)
+
+    band_speeds = [float(np.median(speeds[bands == band])) if (bands == band).any() else default_speed
+                   for band in range(len(model.band_speeds))]
+
+    samples = defaultdict(list)
+    for cell, band, speed in zip(map(tuple, cells.tolist()), bands.tolist(), speeds.tolist()):
+        samples[(cell, band)].append(speed)
+    cell_speeds = defaultdict(lambda: [None] * len(band_speeds))
+    for (cell, band), cell_samples in samples.items():
+        if len(cell_samples) >= min_cell_samples:
+            cell_speeds[cell][band] = float(np.median(cell_samples))
+
+    return SpeedModel(band_speeds, dict(cell_speeds), distance_bands, grid_size)
+
+
+@lru_cache(maxsize=None)
+def speed_models() -> Dict[str, SpeedModel]:
+    """
+    Speed models by transport in routing API format loaded from SPEED_MODEL_PATH, empty if it is not set
+    """
+    if not SPEED_MODEL_PATH or not os.path.exists(SPEED_MODEL_PATH):
+        return {}
+    with open(SPEED_MODEL_PATH) as f:
+        return {mode: SpeedModel.from_dict(model) for mode, model in json.load(f).items()}
+
+
+def duration_matrix_approximation(points: np.ndarray, transport: str) -> np.ndarray:
+    """
+    Approximate durations of movement between every pair of points with calibrated speed model of the transport,
+    or with constant speed from MODE_TO_SPEED if there is no model
+
+    Parameters
+    ----------
+    points: np.ndarray
+        Points in (lat, lon) format with (n, 2) shape
+    transport: str
+        There can be several modes that is supported: "driving", "walking", "bicycling"
+
+    Returns
+    -------
+    np.ndarray
+        Durations in seconds with (n, n) shape
+    """
+    model = speed_models().get(MODE_CONVERTER[transport])
+    if model is None:
+        return haversine_matrix(points) / MODE_TO_SPEED[transport]
+    return model.duration_matrix(points)
+
+
+def main():
+    """
+    Fit speed models on stored matrices: python -m logistic.calibration <matrices directory> <output JSON>
+    """
+    store = MatrixStore(sys.argv[1])
+    speeds = {MODE_CONVERTER[transport]: speed for transport, speed in MODE_TO_SPEED.items()}
+    models = {mode: fit_speed_model(store.matrices(mode), speeds.get(mode, MODE_TO_SPEED['driving'])).to_dict()
+              for mode in store.modes()}
+    with open(sys.argv[2], 'w') as f:
+        json.dump(models, f)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,43 @@
+import os
 import sys
 
 MAX_WEIGHT = sys.maxsize
 SOLUTION_CALCULATION_MAX_TIME = 1
 
+# amount of processes solving problems of batch requests
+SOLVER_WORKERS = int(os.environ.get('SOLVER_WORKERS', os.cpu_count() or 1))
+
+# directory for cProfile dumps of solves, profiling is disabled if it is not set
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+# amount of connections to routing API opened on service startup
+ORS_WARM_UP_CONNECTIONS = 4
+
+# maximum amount of simultaneous connections to routing API
+ORS_MAX_CONNECTIONS = int(os.environ.get('ORS_MAX_CONNECTIONS', 10))
+
+# routing API quotas for every endpoint: (queries per second, burst)
+ORS_RATE_LIMITS = {
+    'matrix': (float(os.environ.get('ORS_MATRIX_RATE', 40 / 60)), 5),
+    'directions': (float(os.environ.get('ORS_DIRECTIONS_RATE', 40 / 60)), 10)
+}
+
+# maximum amount of elements (sources x destinations) in one matrix query, bigger matrices are queried by rows chunks
+ORS_MATRIX_MAX_ELEMENTS = int(os.environ.get('ORS_MATRIX_MAX_ELEMENTS', 3500))
+
+# maximum amount of routes legs which geometry is cached between requests
+LEG_CACHE_SIZE = int(os.environ.get('LEG_CACHE_SIZE', 100000))
+
+# retries of routing API queries rejected by quota (429) or failed on server side (5xx)
+ORS_RETRIES = 3
+# base of exponential backoff between retries in seconds
+ORS_RETRY_BACKOFF = 0.5
+# maximum wait before a retry in seconds, Retry-After of the API is clamped to it
+ORS_MAX_RETRY_WAIT = ORS_RETRY_BACKOFF * 2 ** ORS_RETRIES
+
+# mean earth radius in kilometers (the same as haversine package uses)
+EARTH_RADIUS = 6371.0088
+
 # average speed for different modes in seconds
 MODE_TO_SPEED = {
     'driving': 50 / (60 * 60),
@@ -10,6 +45,13 @@ MODE_TO_SPEED = {
     'bicycling': 12 * 1.6 / (60 * 60)
 }
 
+# JSON with speed models calibrated on routing API matrices (see logistic.calibration),
+# MODE_TO_SPEED is used for approximation if it is not set
+SPEED_MODEL_PATH = os.environ.get('SPEED_MODEL_PATH')
+
+# directory where routing API matrices are stored for calibration, they are not stored if it is not set
+MATRIX_STORE_DIR = os.environ.get('MATRIX_STORE_DIR')
+
 # since we're using ORS on the backend side and google on frontend side we must convert one to another
 MODE_CONVERTER = {
 	'driving': 'driving-car',
@@ -0,0 +1,68 @@
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from logistic.config import MAX_WEIGHT
+
+# reasons of dropping stores that can never be served
+CAPACITY = 'capacity'
+UNREACHABLE = 'unreachable'
+TIME_WINDOW = 'time_window'
+
+
+def infeasible_nodes(duration_matrix: np.ndarray,
+                     amount_of_depots: int,
+                     starts: List[int],
+                     ends: List[int],
+                     demands: Optional[np.ndarray] = None,
+                     capacities: Optional[List[int]] = None,
+                     time_windows: Optional[np.ndarray] = None
+                     ) -> Dict[int, str]:
+    """
+    Find stores that can't be served by any courier before building the routing model
+
+    Parameters
+    ----------
+    duration_matrix: np.ndarray
+        Durations of movement between nodes in seconds with (n, n) shape, MAX_WEIGHT for unreachable pairs
+    amount_of_depots: int
+        Amount of depots, they are the first nodes and are never dropped
+    starts: List[int]
+        Start depot of every courier
+    ends: List[int]
+        End depot of every courier
+    demands: Optional[np.ndarray]
+        Demand of every node. None if there is no capacity constraint
+    capacities: Optional[List[int]]
+        Capacity of every courier. None if there is no capacity constraint
+    time_windows: Optional[np.ndarray]
+        Time windows of every node with (n, 2) shape in int64. None if there is no time constraint
+
+    Returns
+    -------
+    Dict[int, str]
+        Reason of dropping for every infeasible store node: 'capacity' if its demand exceeds capacity of every courier,
+        'unreachable' if it can't be reached from any start depot or can't reach any end depot,
+        'time_window' if its time window closes before any courier can arrive
+        Example: {3: 'capacity', 7: 'time_window'}
+    """
+    nodes = np.arange(amount_of_depots, len(duration_matrix))
+    starts = np.unique(starts)
+    ends = np.unique(ends)
+    reasons = np.full(len(nodes), None, dtype=object)
+
+    # later checks override earlier reasons, so precedence is capacity > unreachable > time_window
+    if time_windows is not None:
+        # the earliest arrival from any start depot opened at the beginning of its time window
+        arrival = time_windows[starts, 0][:, None] + duration_matrix[np.ix_(starts, nodes)]
+        late = (arrival.min(axis=0) > time_windows[nodes, 1]) | (time_windows[nodes, 0] > time_windows[nodes, 1])
+        reasons[late] = TIME_WINDOW
+
+    unreachable = ((duration_matrix[np.ix_(starts, nodes)] >= MAX_WEIGHT).all(axis=0)
+                   | (duration_matrix[np.ix_(nodes, ends)] >= MAX_WEIGHT).all(axis=1))
+    reasons[unreachable] = UNREACHABLE
+
+    if demands is not None and capacities is not None:
+        reasons[demands[nodes] > max(capacities)] = CAPACITY
+
+    return {int(node): reason for node, reason in zip(nodes, reasons) if reason is not None}
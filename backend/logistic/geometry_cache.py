@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from typing import List, Tuple, Dict, Union
+
+Point = Tuple[float, float]
+
+
+class LegCache(object):
+
+    def __init__(self, max_size: int):
+        """
+        LRU cache of routes legs geometry and duration shared between requests
+
+        Parameters
+        ----------
+        max_size: int
+            Maximum amount of cached legs
+        """
+        self.max_size = max_size
+        self._legs = OrderedDict()
+
+    def get(self, from_point: Point, to_point: Point, profile: str) -> Union[Dict[str, Union[List, float]], None]:
+        """
+        Cached leg
+
+        Parameters
+        ----------
+        from_point: Tuple[float, float]
+            Start of the leg in (lon, lat) format
+        to_point: Tuple[float, float]
+            End of the leg in (lon, lat) format
+        profile: str
+            Transport in routing API format. Example: 'driving-car'
+
+        Returns
+        -------
+        Union[Dict[str, Union[List, float]], None]
+            {'geometry': [[lat, lon], ...], 'duration': seconds} or None if leg is not cached
+        """
+        key = (tuple(from_point), tuple(to_point), profile)
+        leg = self._legs.get(key)
+        if leg is not None:
+            self._legs.move_to_end(key)
+        return leg
+
+    def put(self, from_point: Point, to_point: Point, profile: str, geometry: List[List[float]], duration: float):
+        """
+        Cache leg, the least recently used leg is evicted if cache is full
+
+        Parameters
+        ----------
+        from_point: Tuple[float, float]
+            Start of the leg in (lon, lat) format
+        to_point: Tuple[float, float]
+            End of the leg in (lon, lat) format
+        profile: str
+            Transport in routing API format. Example: 'driving-car'
+        geometry: List[List[float]]
+            Leg geometry in [[lat, lon], ...] format including both ends
+        duration: float
+            Duration of the leg in seconds
+        """
+        key = (tuple(from_point), tuple(to_point), profile)
+        self._legs[key] = {'geometry': geometry, 'duration': duration}
+        self._legs.move_to_end(key)
+        while len(self._legs) > self.max_size:
+            self._legs.popitem(last=False)
+
+    def __len__(self):
+        return len(self._legs)
@@ -1,95 +1,251 @@
 from typing import List, Tuple, Dict, Union
-from itertools import combinations, chain
+from itertools import chain
 from cached_property import cached_property
 import time
+import asyncio
+import numpy as np
 import ortools
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
 
 from logistic.config import MAX_WEIGHT, SOLUTION_CALCULATION_MAX_TIME, MODE_CONVERTER
-from logistic.utils import duration_approximation
+from logistic.utils import add_detailed_routes
+from logistic.calibration import duration_matrix_approximation
+from logistic.route_metrics import route_metrics
+from logistic.feasibility import infeasible_nodes
+from logistic.telemetry import SolverTelemetry, capture_stderr
 
 
 class LogisticOptimizer(object):
 
     def __init__(self,
-                 central_store: Dict[str, Union[Tuple[float, float], Tuple[int, int]]],
-                 stores: List[Dict[str, Union[Tuple[float, float], int, Tuple[int, int]]]],
+                 central_store: Union[Dict[str, Union[Tuple[float, float], Tuple[int, int]]],
+                                      List[Dict[str, Union[Tuple[float, float], Tuple[int, int]]]]],
+                 stores: Union[List[Dict[str, Union[Tuple[float, float], int, Tuple[int, int]]]],
+                               Dict[str, Union[List[Union[float, int, None]], np.ndarray]]],
                  couriers: List[Dict[str, Union[str, int]]],
-                 routing_manager: object,
+                 routing_manager: object = None,
                  approximation: bool = True):
         """
         Class for scheduling delivery process
 
         Parameters
         ----------
-        central_store: Dict[str, Union[Tuple[float, float], Tuple[int, int]]]
-           Central store (HQ or a starting point) with all info
+        central_store: Union[Dict[str, Union[Tuple[float, float], Tuple[int, int]]],
+                             List[Dict[str, Union[Tuple[float, float], Tuple[int, int]]]]]
+           Central store (HQ or a starting point) with all info, or list of such depots
            Examples: {"location": [50.486228, 30.472595], "time_window": [0, 1]} or {"location": [50.486228, 30.472595]}
-        stores: List[Dict[str, Union[Tuple[float, float], int, Tuple[int, int]]]]
+                  OR [{"location": [50.486228, 30.472595]}, {"location": [50.45, 30.51], "time_window": [0, 1]}]
+        stores: Union[List[Dict[str, Union[Tuple[float, float], int, Tuple[int, int]]]],
+                      Dict[str, Union[List[Union[float, int, None]], np.ndarray]]]
             List of stores with all their info
                 Examples:  [ {"location": [50.489023, 30.467676], "demand": 1, "time_window": [0, 1] }]
                         OR [ {"location": [50.489023, 30.467676], "time_window": [0, 1] }]
                         OR [ {"location": [50.489023, 30.467676], "demand": 1 }]
+            OR columns of stores info with the same length ("demand", "tw_start" and "tw_end" are optional,
+            missing values of time windows can be None or NaN)
+                Example: {"lat": [50.489023, 50.48], "lon": [30.467676, 30.47], "demand": [1, 2],
+                          "tw_start": [0, None], "tw_end": [1, None]}
         couriers: List[Dict[str, Union[str, int]]]
             List of couriers with all their info
             Examples: [{"capacity": 2, "transport": "walking"}] OR [{"transport": "walking"}]
+            With several depots courier starts at depot with "depot" index (0 by default)
+            and finishes at depot with "end_depot" index (start depot by default)
+            Example: [{"transport": "walking", "depot": 1}, {"transport": "walking", "depot": 0, "end_depot": 1}]
+        routing_manager: object
+            Client for the routing API (``logistic.ors.ORS``). Can be None, then detailed routes are not calculated
         approximation: bool
             False if we don't use Google API, True otherwise
         """
-        self.time_constraint = any([bool(point.get('time_window')) for point in chain([central_store], stores)])
-        self.capacities_constraint = True if any(['demand' in x.keys() for x in stores]) else False
         self.central_store = central_store
+        self.depots = central_store if isinstance(central_store, list) else [central_store]
+        self.amount_of_depots = len(self.depots)
         self.stores = stores
         self.couriers = couriers
 
         # There can be several modes that is supported: "driving", "walking", "bicycling"
-        self.mode = MODE_CONVERTER[couriers[0]['transport']]  # TODO Add processing for different transport types for different couriers
+        self.transport = couriers[0]['transport']
+        self.mode = MODE_CONVERTER[self.transport]  # TODO Add processing for different transport types for different couriers
 
-        self.total_locations = [central_store['location']] + [store['location'] for store in stores]
+        if isinstance(stores, dict):
+            self._read_stores_columns(stores)
+        else:
+            self._read_stores_records(stores)
         self.amount_of_couriers = len(couriers)
 
         if self.capacities_constraint:
-            self.stores_demands = [0] + [store.get('demand', 0) for store in stores]
             self.couriers_capacities = [courier.get('capacity', 0) for courier in couriers]
 
-        if self.time_constraint:
-            self.time_windows = ([central_store.get('time_window', [int(time.time()), MAX_WEIGHT])]
-                                 + [store.get('time_window', [int(time.time()), MAX_WEIGHT]) for store in stores])
-
-        if not approximation:
-            self.routing_manager = routing_manager
+        self.routing_manager = routing_manager
         self.approximation = approximation
+        # road distances between nodes, known only if they were fetched together with durations
+        self.distance_matrix = None
+        # road distances are needed only for metrics, so they are fetched only for solves with metrics
+        self.with_distances = False
+        # statistics of the search, collected only if solve is instrumented
+        self.telemetry = None
+        # stores removed from the model before the search since they can never be served
+        self.infeasible_nodes = []
+
+        # depots are the first nodes, every courier starts and ends at its own depot
+        self.starts = [courier.get('depot', 0) for courier in couriers]
+        self.ends = [courier.get('end_depot', start) for courier, start in zip(couriers, self.starts)]
+        for courier, start, end in zip(couriers, self.starts, self.ends):
+            if not (0 <= start < self.amount_of_depots and 0 <= end < self.amount_of_depots):
+                raise ValueError(f"Courier {courier.get('pid')} has depot index out of {self.amount_of_depots} depots")
 
         # Create the routing index manager.
-        self.manager = pywrapcp.RoutingIndexManager(len(self.total_locations), self.amount_of_couriers, 0)
+        self.manager = pywrapcp.RoutingIndexManager(len(self.total_locations), self.amount_of_couriers,
+                                                    self.starts, self.ends)
+
+    def _read_stores_records(self, stores: List[Dict[str, Union[Tuple[float, float], int, Tuple[int, int]]]]):
+        """
+        Read locations, demands and time windows from the list of stores dicts
+        """
+        self.time_constraint = any([bool(point.get('time_window')) for point in chain(self.depots, stores)])
+        self.capacities_constraint = True if any(['demand' in x.keys() for x in stores]) else False
+
+        self.total_locations = [depot['location'] for depot in self.depots] + [store['location'] for store in stores]
+
+        if self.capacities_constraint:
+            self.stores_demands = [0] * self.amount_of_depots + [store.get('demand', 0) for store in stores]
+
+        if self.time_constraint:
+            self.time_windows = [point.get('time_window', [int(time.time()), MAX_WEIGHT])
+                                 for point in chain(self.depots, stores)]
+
+    def _read_stores_columns(self, stores: Dict[str, Union[List[Union[float, int, None]], np.ndarray]]):
+        """
+        Read locations, demands and time windows from the columns of stores info without building per-store dicts
+        """
+        locations = np.column_stack([np.asarray(stores['lat'], dtype=float), np.asarray(stores['lon'], dtype=float)])
+        self.total_locations = np.vstack([np.asarray([depot['location'] for depot in self.depots], dtype=float),
+                                          locations])
+
+        self.capacities_constraint = 'demand' in stores
+        if self.capacities_constraint:
+            demands = np.nan_to_num(np.asarray(stores['demand'], dtype=float)).astype(np.int64)
+            self.stores_demands = [0] * self.amount_of_depots + demands.tolist()
+
+        tw_start = np.asarray(stores.get('tw_start', np.full(len(locations), np.nan)), dtype=float)
+        tw_end = np.asarray(stores.get('tw_end', np.full(len(locations), np.nan)), dtype=float)
+        self.time_constraint = (any(bool(depot.get('time_window')) for depot in self.depots)
+                                or not (np.isnan(tw_start).all() and np.isnan(tw_end).all()))
+
+        if self.time_constraint:
+            # time windows are kept in int64, since MAX_WEIGHT can't be represented as float
+            windows = np.empty((len(locations), 2), dtype=np.int64)
+            windows[:, 0] = int(time.time())
+            windows[:, 1] = MAX_WEIGHT
+            windows[~np.isnan(tw_start), 0] = tw_start[~np.isnan(tw_start)]
+            windows[~np.isnan(tw_end), 1] = tw_end[~np.isnan(tw_end)]
+            self.time_windows = ([depot.get('time_window', [int(time.time()), MAX_WEIGHT]) for depot in self.depots]
+                                 + windows.tolist())
+
+    @cached_property
+    def duration_matrix(self) -> np.ndarray:
+        """
+        Durations of movement between nodes as (n, n) matrix, where n is amount of locations.
+        Built from ``road_to_weight`` if weights were set to the model
+
+        Returns
+        -------
+        np.ndarray
+            Matrix with durations in seconds, MAX_WEIGHT for unreachable pairs
+        """
+        if 'road_to_weight' in self.__dict__:
+            return self._weights_to_matrix(self.road_to_weight)
+
+        if self.approximation:
+            return duration_matrix_approximation(np.asarray(self.total_locations, dtype=float), self.transport)
+
+        # several nodes can share location (e.g. depot and store), so matrix is queried for unique points
+        # and there is nothing to move between nodes with the same location
+        points = [tuple(point) for point in np.asarray(self.total_locations, dtype=float).tolist()]
+        new_points_weights, new_points_distances = asyncio.run(
+            self.routing_manager.matrix_calculation(list(dict.fromkeys(points)), self.mode, self.with_distances))
+        if new_points_distances is not None:
+            self.distance_matrix = np.array([[0 if point_1 == point_2 else new_points_distances[(point_1, point_2)]
+                                              for point_2 in points] for point_1 in points], dtype=float)
+        return np.array([[0 if point_1 == point_2 else new_points_weights[(point_1, point_2)]
+                          for point_2 in points] for point_1 in points], dtype=float)
 
     @cached_property
-    def road_to_weight(self) -> Dict[Tuple[Tuple[float, float], Tuple[float, float]], float]:
+    def road_to_weight(self) -> Dict[Tuple[int, int], float]:
         """
         Method for calculating weight in salesman problem between every points for optimization problem
 
         Returns
         -------
-        Dict[Tuple[Tuple[float, float], Tuple[float, float]], float]
-            Dict with weights for each locations pairs in (lat, lon) format. \
-            Example: ((0, 0), (45, 45)) : 2
+        Dict[Tuple[int, int], float]
+            Dict with weights for each pair of nodes. \
+            Example: (0, 1) : 2
 
         """
-        points_to_weight = {(i, i): 0 for i in range(len(self.total_locations))}
+        return {(i, j): duration for (i, j), duration in np.ndenumerate(self.duration_matrix)}
 
-        if self.approximation:
-            for point_1, point_2 in combinations(enumerate(self.total_locations), 2):
-                duration = duration_approximation(point_1=point_1[1], point_2=point_2[1], mode=self.mode)
-                points_to_weight.update({
-                    (point_1[0], point_2[0]): duration,
-                    (point_2[0], point_1[0]): duration
-                })
-        else:
-            points2indexes = {tuple(point): i for i, point in enumerate(self.total_locations)}
-            new_points_weights = self.routing_manager.duration_calculation(self.total_locations, self.mode)
-            points_to_weight.update({(points2indexes[key[0]], points2indexes[key[1]]): value for key, value in new_points_weights.items()})
-        return points_to_weight
+    def _weights_to_matrix(self, weights: Dict[Tuple[int, int], float]) -> np.ndarray:
+        """
+        Convert weights between nodes to matrix
+
+        Parameters
+        ----------
+        weights: Dict[Tuple[int, int], float]
+            Weights in ``road_to_weight`` format
+
+        Returns
+        -------
+        np.ndarray
+            Matrix with (n, n) shape, where n is amount of locations
+        """
+        matrix = np.zeros((len(self.total_locations), len(self.total_locations)))
+        if weights:
+            nodes = np.array(list(weights.keys()), dtype=int)
+            matrix[nodes[:, 0], nodes[:, 1]] = np.fromiter(weights.values(), dtype=float, count=len(weights))
+        return matrix
+
+    def _transit_matrix(self) -> List[List[int]]:
+        """
+        Durations between nodes as integers for OR-Tools callbacks, MAX_WEIGHT for unreachable pairs
+
+        Returns
+        -------
+        List[List[int]]
+            Durations with (n, n) shape, where n is amount of locations
+        """
+        # MAX_WEIGHT is rounded up as float and would overflow int64, so unreachable pairs are filled separately
+        reachable = self.duration_matrix < MAX_WEIGHT
+        transit = np.full(self.duration_matrix.shape, MAX_WEIGHT, dtype=np.int64)
+        transit[reachable] = self.duration_matrix[reachable]
+        return transit.tolist()
+
+    def solution_metrics(self,
+                         routes_nodes: List[List[int]],
+                         arrival_times: Union[List[List[int]], None]
+                         ) -> List[Dict[str, Union[float, int, None]]]:
+        """
+        Calculate quality metrics of decoded routes without any extra routing API queries
+
+        Parameters
+        ----------
+        routes_nodes: List[List[int]]
+            Node indexes of every courier route including start and end depot nodes
+        arrival_times: Union[List[List[int]], None]
+            Arrival time for every node of ``routes_nodes``. None if there is no time constraint
+
+        Returns
+        -------
+        List[Dict[str, Union[float, int, None]]]
+            Metrics for every route (see ``logistic.route_metrics.route_metrics``)
+        """
+        return route_metrics(routes_nodes=routes_nodes,
+                             locations=np.asarray(self.total_locations, dtype=float),
+                             duration_matrix=self.duration_matrix,
+                             distance_matrix=self.distance_matrix,
+                             demands=np.asarray(self.stores_demands) if self.capacities_constraint else None,
+                             capacities=self.couriers_capacities if self.capacities_constraint else None,
+                             time_windows=np.asarray(self.time_windows, dtype=np.int64) if self.time_constraint else None,
+                             arrival_times=arrival_times)
 
     def demand_callback(self, from_index) -> int:
         """
@@ -119,18 +275,20 @@ class LogisticOptimizer(object):
         to_index
         Returns
         -------
-        float
+        int
             Time to get from one node to another (route time)
 
         """
         # Convert from routing variable Index to time matrix NodeIndex.
         from_node = self.manager.IndexToNode(from_index)
         to_node = self.manager.IndexToNode(to_index)
-        return self.road_to_weight[(from_node, to_node)]
+        # OR-Tools works with integer transits
+        return self.transit_matrix[from_node][to_node]
 
     def decode_solution(self,
                         routing: ortools.constraint_solver.pywrapcp.RoutingModel,
-                        solution: ortools.constraint_solver.pywrapcp.Assignment
+                        solution: ortools.constraint_solver.pywrapcp.Assignment,
+                        with_metrics: bool = False
                         ) -> Dict[str, Union[List[Dict], List[Dict]]]:
         """
         Decode ortools solution to REST format
@@ -141,10 +299,13 @@ class LogisticOptimizer(object):
             Routing that was using for solving Vehicle Routing Problem
         solution: ortools.constraint_solver.pywrapcp.Assignment
             Solution of problem
+        with_metrics: bool
+            True if quality metrics of every route should be added to the result
 
         Returns
         -------
         Dict[str, Union[List[Dict], List[Dict]]]
+        Stores removed before the search have 'reason' of dropping (see ``logistic.feasibility.infeasible_nodes``)
         Example: 
         {
             'routes': [
@@ -161,47 +322,74 @@ class LogisticOptimizer(object):
             ], 
             'dropped_nodes': [{'lat': 6, 'lng': 6}] 
         }
+        With metrics there is also 'metrics' key with list of ``logistic.route_metrics.route_metrics`` dicts
+        (with 'courier_id') in the same order as routes
 
         """
         # calculate dropping nodes
-        dropped_nodes = []
+        dropped_nodes = list(self.infeasible_nodes)
 
         for node in range(routing.Size()):
             if routing.IsStart(node) or routing.IsEnd(node):
                 continue
-            if solution.Value(routing.NextVar(node)) == node:
+            if solution.Value(routing.NextVar(node)) == node and self.manager.IndexToNode(node) >= self.amount_of_depots:
                 lat, lng = self.total_locations[self.manager.IndexToNode(node)]
                 dropped_nodes.append({'lat': lat, 'lng': lng})
 
+        time_dimension = routing.GetDimensionOrDie('Time')
+
         # calculate route for deliveryman
         routes = []
+        routes_nodes = []
+        arrival_times = []
         for courier_number in range(self.amount_of_couriers):
             index = routing.Start(courier_number)
             route = []
-            while not routing.IsEnd(index):
-                lat, lng = self.total_locations[self.manager.IndexToNode(index)]
+            nodes = []
+            arrivals = []
+            while True:
+                nodes.append(self.manager.IndexToNode(index))
+                arrivals.append(solution.Min(time_dimension.CumulVar(index)))
+                if routing.IsEnd(index):
+                    # return to the start depot is not a part of the route, but finishing at another depot is
+                    if self.ends[courier_number] != self.starts[courier_number]:
+                        lat, lng = self.total_locations[nodes[-1]]
+                        route.append({'lat': lat, 'lng': lng})
+                    break
+                lat, lng = self.total_locations[nodes[-1]]
                 route.append({'lat': lat, 'lng': lng})
                 index = solution.Value(routing.NextVar(index))
 
             courier_id = self.couriers[courier_number]['pid']
             routes.append({'courier_id': courier_id, 'route': route})
-
-        points = [[[coords['lng'], coords['lat']] for coords in obj['route']] for obj in routes]
-
-        detailed_routes, new_drop = self.routing_manager.directions_calculation(points, self.mode)
-        dropped_nodes.extend([{'lat': node[1], 'lng': node[0]} for node in new_drop])
-
-        for i, route in enumerate(routes):
-            route['detailed_route'] = [{'lat': p[0], 'lng': p[1]} for p in detailed_routes[i]]
-
-            route['route'] = [coords for coords in route['route'] if coords not in dropped_nodes]
-
-        return {'routes': routes, 'dropped_nodes': dropped_nodes}
-
-    def solve(self) -> Dict[str, Union[List[Tuple[int, int]], List[List[Tuple[int, int]]]]]:
+            routes_nodes.append(nodes)
+            arrival_times.append(arrivals)
+
+        decoded = {'routes': routes, 'dropped_nodes': dropped_nodes}
+        if with_metrics:
+            metrics = self.solution_metrics(routes_nodes, arrival_times if self.time_constraint else None)
+            decoded['metrics'] = [dict(courier_id=route['courier_id'], **metric)
+                                  for route, metric in zip(routes, metrics)]
+        if self.routing_manager is not None:
+            decoded = asyncio.run(add_detailed_routes(decoded, self.routing_manager, self.mode))
+
+        return decoded
+
+    def solve(self,
+              with_metrics: bool = False,
+              instrumentation: bool = False
+              ) -> Dict[str, Union[List[Tuple[int, int]], List[List[Tuple[int, int]]]]]:
         """
         The main method of the class. Method for solving delivery problem.
         Depending from hardness of request, we add different dimentions to solve a problem.
+
+        Parameters
+        ----------
+        with_metrics: bool
+            True if quality metrics of every route should be added to the result
+        instrumentation: bool
+            True if search statistics should be collected and added to the result (slows down the search)
+
         Returns
         -------
         Dict[str, Union[List[Tuple[int, int]], List[List[Tuple[int, int]]]]]
@@ -210,7 +398,17 @@ class LogisticOptimizer(object):
                 Every points subset starts with store location
             dropped_modes:
                 Nodes that can't be reached from central store
+            metrics:
+                Quality metrics of every route, only if with_metrics is True
+            telemetry:
+                Search statistics (see ``logistic.telemetry.SolverTelemetry.report``), only if instrumentation is True
         """
+        self.telemetry = SolverTelemetry() if instrumentation else None
+        self.with_distances = with_metrics
+
+        self._drop_infeasible_nodes()
+        self.transit_matrix = self._transit_matrix()
+
         routing = pywrapcp.RoutingModel(self.manager)
 
         routing = self._add_time_dimention(routing)
@@ -218,15 +416,78 @@ class LogisticOptimizer(object):
         if self.capacities_constraint:
             routing = self._add_capacity_dimention(routing)
 
-        # Allow to drop nodes.
-        for node in range(1, len(self.total_locations)):
-            routing.AddDisjunction([self.manager.NodeToIndex(node)], MAX_WEIGHT)
+        # Allow to drop nodes. Sum of penalties of all nodes must not overflow int64 together with routes cost,
+        # otherwise solutions with dropped nodes get saturated cost and are rejected by the solver.
+        drop_penalty = MAX_WEIGHT // (2 * len(self.total_locations))
+        for node in range(self.amount_of_depots, len(self.total_locations)):
+            routing.AddDisjunction([self.manager.NodeToIndex(node)], drop_penalty)
+        # depots without couriers are ordinary nodes for the solver, they don't need to be visited
+        for node in set(range(self.amount_of_depots)) - set(self.starts) - set(self.ends):
+            routing.AddDisjunction([self.manager.NodeToIndex(node)], 0)
 
         search_parameters = self._create_search_parameters()
 
-        solution = routing.SolveWithParameters(search_parameters)
+        if self.telemetry is None:
+            solution = routing.SolveWithParameters(search_parameters)
+            return self.decode_solution(solution=solution, routing=routing, with_metrics=with_metrics)
+
+        routing.AddAtSolutionCallback(self.telemetry.solution_callback(routing))
+        search_parameters.log_search = True
+        with capture_stderr(self.telemetry.search_log):
+            solution = routing.SolveWithParameters(search_parameters)
+        self.telemetry.finish(routing)
+
+        decoded = self.decode_solution(solution=solution, routing=routing, with_metrics=with_metrics)
+        decoded['telemetry'] = self.telemetry.report()
+        return decoded
 
-        return self.decode_solution(solution=solution, routing=routing)
+    def _drop_infeasible_nodes(self):
+        """
+        Remove stores that can never be served from the model, so the solver doesn't search over them.
+        Locations, demands, time windows and weights are shrunk to the rest of nodes
+        """
+        reasons = infeasible_nodes(
+            duration_matrix=self.duration_matrix,
+            amount_of_depots=self.amount_of_depots,
+            starts=self.starts,
+            ends=self.ends,
+            demands=np.asarray(self.stores_demands) if self.capacities_constraint else None,
+            capacities=self.couriers_capacities if self.capacities_constraint else None,
+            time_windows=np.asarray(self.time_windows, dtype=np.int64) if self.time_constraint else None)
+        if not reasons:
+            return
+
+        for node, reason in reasons.items():
+            lat, lng = self.total_locations[node]
+            self.infeasible_nodes.append({'lat': lat, 'lng': lng, 'reason': reason})
+
+        kept = [node for node in range(len(self.total_locations)) if node not in reasons]
+        if isinstance(self.total_locations, np.ndarray):
+            self.total_locations = self.total_locations[kept]
+        else:
+            self.total_locations = [self.total_locations[node] for node in kept]
+        if self.capacities_constraint:
+            self.stores_demands = [self.stores_demands[node] for node in kept]
+        if self.time_constraint:
+            self.time_windows = [self.time_windows[node] for node in kept]
+
+        self.duration_matrix = self.duration_matrix[np.ix_(kept, kept)]
+        if self.distance_matrix is not None:
+            self.distance_matrix = self.distance_matrix[np.ix_(kept, kept)]
+        # weights by nodes are rebuilt from the shrunk matrix if they are needed
+        self.__dict__.pop('road_to_weight', None)
+
+        # depots are the first nodes and are never removed, so couriers starts and ends are the same
+        self.manager = pywrapcp.RoutingIndexManager(len(self.total_locations), self.amount_of_couriers,
+                                                    self.starts, self.ends)
+
+    def _callback(self, name: str, callback):
+        """
+        Callback for registering in routing, wrapped with telemetry if solve is instrumented
+        """
+        if self.telemetry is None:
+            return callback
+        return self.telemetry.wrap_callback(name, callback)
 
     def _add_capacity_dimention(self, routing):
         """
@@ -236,7 +497,7 @@ class LogisticOptimizer(object):
         Rounting with added capacity dimention.
         """
 
-        demand_callback_index = routing.RegisterUnaryTransitCallback(self.demand_callback)
+        demand_callback_index = routing.RegisterUnaryTransitCallback(self._callback('demand', self.demand_callback))
 
         dimension_name = 'Capacity'
         routing.AddDimensionWithVehicleCapacity(
@@ -256,7 +517,7 @@ class LogisticOptimizer(object):
         Rounting with added time window dimention.
         """
 
-        transit_callback_index = routing.RegisterTransitCallback(self.time_callback)
+        transit_callback_index = routing.RegisterTransitCallback(self._callback('time', self.time_callback))
 
         # Define cost of each arc.
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
@@ -272,18 +533,19 @@ class LogisticOptimizer(object):
 
         time_dimension = routing.GetDimensionOrDie(dimension_name)
 
-        # Add time window constraints for each location except depot.
+        # Add time window constraints for each location except depots.
         if self.time_constraint:
             for location_idx, time_window in enumerate(self.time_windows):
-                if location_idx == 0:
+                if location_idx < self.amount_of_depots:
                     continue
                 index = self.manager.NodeToIndex(location_idx)
                 time_dimension.CumulVar(index).SetRange(time_window[0], time_window[1])
-            # Add time window constraints for each vehicle start node.
+            # Add time window constraints for each vehicle start and end nodes.
             for vehicle_id in range(self.amount_of_couriers):
-                index = routing.Start(vehicle_id)
-                time_dimension.CumulVar(index).SetRange(self.time_windows[0][0],
-                                                        self.time_windows[0][1])
+                start_window = self.time_windows[self.starts[vehicle_id]]
+                time_dimension.CumulVar(routing.Start(vehicle_id)).SetRange(start_window[0], start_window[1])
+                end_window = self.time_windows[self.ends[vehicle_id]]
+                time_dimension.CumulVar(routing.End(vehicle_id)).SetRange(end_window[0], end_window[1])
 
             # Instantiate route start and end times to produce feasible times.
             for i in range(self.amount_of_couriers):
@@ -1,6 +1,9 @@
-from haversine import haversine
 from typing import List, Tuple
 
+import numpy as np
+
+from logistic.utils import haversine_vector
+
 
 def calculate_routes_distance(routes: List[List[Tuple[int, int]]]) -> List[float]:
     """
@@ -19,10 +22,8 @@ def calculate_routes_distance(routes: List[List[Tuple[int, int]]]) -> List[float
 
     """
     distances = []
-    distance = 0
     for route in routes:
-        for i, point in enumerate(route[:-1]):
-            distance += haversine(point, route[i + 1])
-        distances.append(distance)
+        points = np.asarray(route, dtype=float).reshape(-1, 2)
+        distances.append(float(haversine_vector(points[:-1], points[1:]).sum()))
 
     return distances
@@ -1,20 +1,46 @@
 import aiohttp
 import os
+import math
+import random
 import asyncio
-import nest_asyncio
 import itertools
-from typing import List, Tuple, Dict, Coroutine, Any
+import numpy as np
+from typing import List, Tuple, Dict, Coroutine, Any, Union
 
-from openrouteservice import convert
+from logistic.config import MAX_WEIGHT, ORS_RETRIES, ORS_RETRY_BACKOFF, ORS_MAX_RETRY_WAIT, ORS_MATRIX_MAX_ELEMENTS
+from logistic.rate_limit import RateLimiter
+from logistic.geometry_cache import LegCache
+from logistic.calibration import MatrixStore
 
-from logistic.config import MAX_WEIGHT
 
-nest_asyncio.apply()
+def error_point_index(result: dict) -> Union[int, None]:
+    """
+    Index of the point that can't be routed from Openroute Service API error response
+
+    Parameters
+    ----------
+    result: dict
+        Error response. Example: {'error': {'code': 2010, 'message': 'Could not find point 1: 30.5 50.4 within ...'}}
+
+    Returns
+    -------
+    Union[int, None]
+        Index of point or None if error is not about a point
+    """
+    try:
+        return int(result['error']['message'].split(':')[0].split(' ')[-1])
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
 
 
 class ORS(object):
 
-    def __init__(self, async_session: aiohttp.ClientSession):
+    def __init__(self,
+                 async_session: aiohttp.ClientSession,
+                 rate_limiter: RateLimiter = None,
+                 priority: str = 'interactive',
+                 leg_cache: LegCache = None,
+                 matrix_store: MatrixStore = None):
         """
         Class for querying Google API
 
@@ -23,9 +49,22 @@ class ORS(object):
         async_session: aiohttp.ClientSession
             Mode in which deliveryman moving
             There can be several modes that is supported: "driving-car", "foot-walking", "cycling-reglar"
+        rate_limiter: RateLimiter
+            Limiter of queries shared between all requests to the service. Queries are not limited if it is None
+        priority: str
+            Priority lane of queries: 'interactive' or 'batch'
+        leg_cache: LegCache
+            Cache of routes legs shared between all requests to the service. Full routes are queried if it is None
+        matrix_store: MatrixStore
+            Storage of duration matrices for calibration of approximation. Matrices are not stored if it is None
         """
         self.session = async_session
-        self.base_api_url = 'https://api.openrouteservice.org/v2/{}/{}'
+        self.rate_limiter = rate_limiter
+        self.priority = priority
+        self.leg_cache = leg_cache
+        self.matrix_store = matrix_store
+        self.api_url = 'https://api.openrouteservice.org'
+        self.base_api_url = self.api_url + '/v2/{}/{}'
         self.api_key = os.environ.get('ORS_API_KEY')
 
     async def fetch(self,
@@ -33,6 +72,9 @@ class ORS(object):
                     points: List[Tuple[float, float]],
                     ref: str,
                     mode: str,
+                    sources: List[int] = None,
+                    destinations: List[int] = None,
+                    metrics: List[str] = None
                     ) -> dict:
         """
         Fetch data from Openroute Service API
@@ -48,6 +90,12 @@ class ORS(object):
             Specifies a part of the API to call. Either 'matrix' or 'directions'. 
         mode: str
             Specifies a transport
+        sources: List[int]
+            Indexes of points which rows of matrix are queried, all rows if it is None
+        destinations: List[int]
+            Indexes of points which columns of matrix are queried, all columns if it is None
+        metrics: List[str]
+            Metrics of matrix query, only durations (["duration"]) if it is None
 
         Returns
         -------
@@ -61,7 +109,11 @@ class ORS(object):
 
         body = {}
         if ref == 'matrix':
-            body = {"locations": points}
+            body = {"locations": points, "metrics": metrics or ["duration"]}
+            if sources is not None:
+                body["sources"] = sources
+            if destinations is not None:
+                body["destinations"] = destinations
         elif ref == 'directions':
             body = {"coordinates": points}
 
@@ -72,24 +124,57 @@ class ORS(object):
         }
 
         dropped_nodes = []
-        async with client.post(url, json=body, headers=headers) as resp:
-            if resp.status == 200:
-                result = await resp.json()
-                return {'response': result, 'dropped_nodes': dropped_nodes}
-            else:
-                result = await resp.json()
-                err = result['error']['message']
-                idx_err = int(err.split(':')[0].split(' ')[-1])
-                dropped_nodes.append(points[idx_err])
-                del points[idx_err]
-                if len(points) > 1:
-                    updated_resp = await self.fetch(self.session, points, ref, mode)
-                    dropped_nodes.extend(updated_resp['dropped_nodes'])
-                    return {'response': updated_resp['response'], 'dropped_nodes': dropped_nodes}
-                else:
-                    return {'response': [], 'dropped_nodes': dropped_nodes}
+        for attempt in range(ORS_RETRIES + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(ref, self.priority)
+            async with client.post(url, json=body, headers=headers) as resp:
+                if resp.status == 200:
+                    result = await resp.json()
+                    return {'response': result, 'dropped_nodes': dropped_nodes}
+                quota_or_unavailable = resp.status == 429 or resp.status >= 500
+                if quota_or_unavailable and attempt == ORS_RETRIES:
+                    resp.raise_for_status()
+                if not quota_or_unavailable:
+                    try:
+                        result = await resp.json(content_type=None)
+                    except ValueError:
+                        result = {}
+                    idx_err = error_point_index(result)
+                    # matrix without a point doesn't match requested points, so only directions drop points
+                    if idx_err is None or ref == 'matrix':
+                        resp.raise_for_status()
+                    break
+                retry_after = resp.headers.get('Retry-After', '')
+            # retry with jittered exponential backoff, unless API told us how long to wait (within ORS_MAX_RETRY_WAIT)
+            await asyncio.sleep(min(float(retry_after), ORS_MAX_RETRY_WAIT) if retry_after.isdigit()
+                                else random.uniform(0, ORS_RETRY_BACKOFF * 2 ** attempt))
+
+        dropped_nodes.append(points[idx_err])
+        del points[idx_err]
+        if len(points) > 1:
+            updated_resp = await self.fetch(self.session, points, ref, mode)
+            dropped_nodes.extend(updated_resp['dropped_nodes'])
+            return {'response': updated_resp['response'], 'dropped_nodes': dropped_nodes}
+        else:
+            return {'response': [], 'dropped_nodes': dropped_nodes}
             
 
+    async def open_connections(self, amount: int):
+        """
+        Open connections to Openroute Service API, so they are kept alive in the session pool
+        and the first real query doesn't pay for connection setup
+
+        Parameters
+        ----------
+        amount: int
+            Amount of connections to open
+        """
+        async def head():
+            async with self.session.head(self.api_url) as resp:
+                return resp.status
+
+        await asyncio.gather(*[head() for _ in range(amount)])
+
     async def call_api(self,
                        points: Tuple[Tuple[float, float], Tuple[float, float]],
                        ref: str,
@@ -144,7 +229,39 @@ class ORS(object):
 
         return returns
 
-    def duration_calculation(self, points: List[Tuple[float, float]], mode: str) -> Dict[Tuple[float, float], float]:
+    async def query_matrix(self,
+                           points: List[Tuple[float, float]],
+                           mode: str,
+                           blocks: List[Tuple[Union[List[int], None], Union[List[int], None]]],
+                           metrics: List[str]
+                           ) -> List[dict]:
+        """
+        Query blocks of matrix concurrently
+
+        Parameters
+        ----------
+        points: List[Tuple[float, float]]
+            Points in (lon, lat) format
+        mode: str
+            Specifies a transport
+        blocks: List[Tuple[Union[List[int], None], Union[List[int], None]]]
+            Indexes of sources and destinations of every query, None for all points
+        metrics: List[str]
+            Metrics of queries (see ``fetch``)
+
+        Returns
+        -------
+        List[dict]
+            Responses in ``fetch`` format in the same order as blocks
+        """
+        return await asyncio.gather(*[self.fetch(self.session, points, 'matrix', mode,
+                                                 sources=sources, destinations=destinations, metrics=metrics)
+                                      for sources, destinations in blocks])
+
+    async def duration_calculation(self,
+                                   points: List[Tuple[float, float]],
+                                   mode: str
+                                   ) -> Dict[Tuple[float, float], float]:
         """
         Calculate duration for moving between points
 
@@ -167,17 +284,90 @@ class ORS(object):
                           (30.55375538507264, 50.55876662752421)): 9223372036854775807]
 
         """
-        ors_points = [[coord[1], coord[0]] for coord in points]
-        returns = asyncio.run(self.query(ors_points, 'matrix', mode))
-
-        durations = returns[0]['response']['durations']
-
-        points_dictionaries = {(tuple(points[i]), tuple(points[j])): durations[i][j] if durations[i][j] else MAX_WEIGHT 
-                                for j in range(len(points)) for i in range(len(points))}
+        return (await self.matrix_calculation(points, mode))[0]
+
+    async def matrix_calculation(self,
+                                 points: List[Tuple[float, float]],
+                                 mode: str,
+                                 with_distances: bool = False,
+                                 destinations: List[Tuple[float, float]] = None
+                                 ) -> Tuple[Dict[Tuple[float, float], float],
+                                            Union[Dict[Tuple[float, float], float], None]]:
+        """
+        Calculate duration and road distance for moving from points to destinations.
+        Matrix is queried by blocks, so every query has at most ORS_MATRIX_MAX_ELEMENTS elements
 
-        return points_dictionaries
+        Parameters
+        ----------
+        points: List[List[float, float]]
+            List of points tuples in (lat, lon) format between each we need to calculate duration of movement.
+            Examples:  [(30.302990054837696, 50.50609174896435),(30.55375538507264, 50.55876662752421),
+                        (34.302990054837696, 50.50609174896435),(30.55375538507264, 50.55876662752421)]
+        mode: str
+            Specifies a transport
+        with_distances: bool
+            True if road distances are queried too (they are needed only for metrics)
+        destinations: List[Tuple[float, float]]
+            Points in (lat, lon) format to calculate movement to, the same points if it is None
 
-    def directions_calculation(self, points: List[List[Tuple[float, float]]], mode: str) -> List[List[Tuple[float, float]]]:
+        Returns
+        -------
+        Tuple[Dict[Tuple[float, float], float], Union[Dict[Tuple[float, float], float], None]]
+            Dicts with information about duration (in seconds) and distance (in meters) of movements between points
+            in ``duration_calculation`` format. Distances are None if with_distances is False
+        """
+        sources = [tuple(point) for point in points]
+        destinations = sources if destinations is None else [tuple(point) for point in destinations]
+        locations = list(dict.fromkeys(sources + destinations))
+        location_index = {point: i for i, point in enumerate(locations)}
+        sources_indexes = [location_index[point] for point in sources]
+        destinations_indexes = [location_index[point] for point in destinations]
+
+        # NaN marks pairs without route, zero is a real value (e.g. on the diagonal)
+        durations = np.full((len(sources), len(destinations)), np.nan)
+        distances = np.full((len(sources), len(destinations)), np.nan) if with_distances else None
+        if len(locations) <= 1:
+            durations[:] = 0
+            if with_distances:
+                distances[:] = 0
+        else:
+            columns = min(len(destinations), ORS_MATRIX_MAX_ELEMENTS)
+            rows = max(1, ORS_MATRIX_MAX_ELEMENTS // columns)
+            blocks = [(row, column) for row in range(0, len(sources), rows)
+                      for column in range(0, len(destinations), columns)]
+            queries = [(sources_indexes[row:row + rows], destinations_indexes[column:column + columns])
+                       for row, column in blocks]
+            # the whole square matrix is queried without sources and destinations
+            if len(blocks) == 1 and sources_indexes == destinations_indexes == list(range(len(locations))):
+                queries = [(None, None)]
+            returns = await self.query_matrix([[point[1], point[0]] for point in locations], mode, queries,
+                                              ['duration', 'distance'] if with_distances else ['duration'])
+            for (row, column), ret in zip(blocks, returns):
+                block = np.array(ret['response']['durations'], dtype=float)
+                durations[row:row + block.shape[0], column:column + block.shape[1]] = block
+                if with_distances:
+                    block = np.array(ret['response']['distances'], dtype=float)
+                    distances[row:row + block.shape[0], column:column + block.shape[1]] = block
+        if self.matrix_store is not None:
+            # compression and writing of the matrix don't block the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self.matrix_store.save,
+                                                             sources, destinations, durations, mode)
+
+        points_durations = {(point_1, point_2): MAX_WEIGHT if math.isnan(duration) else duration
+                            for point_1, row in zip(sources, durations.tolist())
+                            for point_2, duration in zip(destinations, row)}
+        if not with_distances:
+            return points_durations, None
+        points_distances = {(point_1, point_2): MAX_WEIGHT if math.isnan(distance) else distance
+                            for point_1, row in zip(sources, distances.tolist())
+                            for point_2, distance in zip(destinations, row)}
+
+        return points_durations, points_distances
+
+    async def directions_calculation(self,
+                                     points: List[List[Tuple[float, float]]],
+                                     mode: str
+                                     ) -> Tuple[List[List[List[float]]], List[List[float]]]:
         """
         Calculate direction for moving between points
 
@@ -200,7 +390,12 @@ class ORS(object):
                         ]
 
         """
-        returns = asyncio.run(self.query(points, 'directions', mode))
+        if self.leg_cache is not None:
+            return await self.cached_directions(points, mode)
+
+        from openrouteservice import convert
+
+        returns = await self.query(points, 'directions', mode)
 
         resps = [obj['response'] for obj in returns]
         dropped_nodes = list(itertools.chain.from_iterable([ret['dropped_nodes'] for ret in returns]))
@@ -210,3 +405,83 @@ class ORS(object):
 
         return routes, dropped_nodes
 
+    async def cached_directions(self,
+                                points: List[List[Tuple[float, float]]],
+                                mode: str
+                                ) -> Tuple[List[List[List[float]]], List[List[float]]]:
+        """
+        Assemble directions from cached legs. Uncached legs are queried in one concurrent pass:
+        every run of consecutive uncached legs of a route is one directions query, which is split into legs by way points
+
+        Parameters
+        ----------
+        points: List[List[float, float]]
+            List of routes with points in (lon, lat) format
+        mode: str
+            Specifies a transport
+
+        Returns
+        -------
+        Tuple[List[List[List[float]]], List[List[float]]]
+            Routes coordinates and dropped nodes in ``directions_calculation`` format
+        """
+        from openrouteservice import convert
+
+        # geometry of every leg by (route number, index of the first point), taken from the cache or the routing API
+        legs = {}
+        # runs of consecutive uncached legs: (route number, index of the first point, index of the last point)
+        runs = []
+        for route_number, route in enumerate(points):
+            start = None
+            for i in range(len(route) - 1):
+                leg = self.leg_cache.get(route[i], route[i + 1], mode)
+                cached = leg is not None
+                if cached:
+                    legs[(route_number, i)] = leg['geometry']
+                if not cached and start is None:
+                    start = i
+                if cached and start is not None:
+                    runs.append((route_number, start, i))
+                    start = None
+            if start is not None:
+                runs.append((route_number, start, len(route) - 1))
+
+        returns = await asyncio.gather(*[self.call_api(list(points[route_number][start:end + 1]), 'directions', mode)
+                                         for route_number, start, end in runs])
+
+        dropped_nodes = []
+        # geometry of runs with dropped nodes can't be split into legs, it's used as is
+        uncacheable_runs = {}
+        for (route_number, start, end), ret in zip(runs, returns):
+            if not ret['response']:
+                dropped_nodes.extend(ret['dropped_nodes'])
+                uncacheable_runs[(route_number, start)] = (end, [])
+                continue
+            route = ret['response']['routes'][0]
+            geometry = [[coord[1], coord[0]] for coord in convert.decode_polyline(route['geometry'])['coordinates']]
+            if ret['dropped_nodes']:
+                dropped_nodes.extend(ret['dropped_nodes'])
+                uncacheable_runs[(route_number, start)] = (end, geometry)
+                continue
+            way_points = route['way_points']
+            for leg, segment in enumerate(route['segments']):
+                legs[(route_number, start + leg)] = geometry[way_points[leg]:way_points[leg + 1] + 1]
+                self.leg_cache.put(points[route_number][start + leg], points[route_number][start + leg + 1], mode,
+                                   legs[(route_number, start + leg)], segment['duration'])
+
+        routes = []
+        for route_number, route in enumerate(points):
+            coordinates = []
+            i = 0
+            while i < len(route) - 1:
+                if (route_number, i) in uncacheable_runs:
+                    end, geometry = uncacheable_runs[(route_number, i)]
+                    i = end
+                else:
+                    geometry = legs[(route_number, i)]
+                    i += 1
+                # the first point of a leg is the last point of the previous one
+                coordinates.extend(geometry[1:] if coordinates else geometry)
+            routes.append(coordinates)
+
+        return routes, dropped_nodes
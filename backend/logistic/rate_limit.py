@@ -0,0 +1,125 @@
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Dict, Tuple
+
+# priority lanes of routing API queries, lower value is served first
+PRIORITIES = {
+    'interactive': 0,
+    'batch': 1
+}
+
+
+class TokenBucket(object):
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Token bucket with priority queue of waiters: while there are waiting queries of higher priority,
+        queries of lower priority don't get tokens
+
+        Parameters
+        ----------
+        rate: float
+            Amount of tokens added per second
+        capacity: int
+            Maximum amount of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._waiters = []
+        self._counter = itertools.count()
+        self._wake_up = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _dispatch(self):
+        """
+        Give tokens to waiters in priority order and schedule next dispatch if somebody is still waiting
+        """
+        self._wake_up = None
+        self._refill()
+        while self._waiters and self.tokens >= 1:
+            _, _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+
+        if self._waiters and self._wake_up is None:
+            loop = asyncio.get_event_loop()
+            self._wake_up = loop.call_later((1 - self.tokens) / self.rate, self._dispatch)
+
+    async def acquire(self, priority: str = 'interactive'):
+        """
+        Wait for a token
+
+        Parameters
+        ----------
+        priority: str
+            Priority lane of the query, one of PRIORITIES keys
+        """
+        self._refill()
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return
+
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES[priority], next(self._counter), priority, future))
+        self._dispatch()
+        try:
+            await future
+        finally:
+            # cancelled waiters are skipped by dispatch, but shouldn't be counted in queue depth
+            if not future.done():
+                future.cancel()
+
+    def queue_depth(self) -> Dict[str, int]:
+        """
+        Amount of waiting queries in every priority lane
+        """
+        depth = dict.fromkeys(PRIORITIES, 0)
+        for _, _, priority, future in self._waiters:
+            if not future.done():
+                depth[priority] += 1
+        return depth
+
+
+class RateLimiter(object):
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]]):
+        """
+        Rate limiter with token bucket for every endpoint of the routing API
+
+        Parameters
+        ----------
+        limits: Dict[str, Tuple[float, int]]
+            Rate (queries per second) and burst for every endpoint
+            Example: {'matrix': (0.66, 5), 'directions': (0.66, 10)}
+        """
+        self.buckets = {endpoint: TokenBucket(rate, capacity) for endpoint, (rate, capacity) in limits.items()}
+
+    async def acquire(self, endpoint: str, priority: str = 'interactive'):
+        """
+        Wait until query to the endpoint is allowed
+
+        Parameters
+        ----------
+        endpoint: str
+            Endpoint of the routing API. Example: 'matrix'
+        priority: str
+            Priority lane of the query, one of PRIORITIES keys
+        """
+        await self.buckets[endpoint].acquire(priority)
+
+    def queue_depth(self) -> Dict[str, Dict[str, int]]:
+        """
+        Amount of waiting queries for every endpoint and priority lane
+        Example: {'matrix': {'interactive': 0, 'batch': 3}, 'directions': {'interactive': 1, 'batch': 0}}
+        """
+        return {endpoint: bucket.queue_depth() for endpoint, bucket in self.buckets.items()}
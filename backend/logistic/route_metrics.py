@@ -0,0 +1,88 @@
+from typing import List, Dict, Union, Optional
+
+import numpy as np
+
+from logistic.config import MAX_WEIGHT
+from logistic.utils import haversine_vector
+
+
+def route_metrics(routes_nodes: List[List[int]],
+                  locations: np.ndarray,
+                  duration_matrix: np.ndarray,
+                  distance_matrix: Optional[np.ndarray] = None,
+                  demands: Optional[np.ndarray] = None,
+                  capacities: Optional[List[int]] = None,
+                  time_windows: Optional[np.ndarray] = None,
+                  arrival_times: Optional[List[List[int]]] = None
+                  ) -> List[Dict[str, Union[float, int, None]]]:
+    """
+    Calculate quality metrics of every courier route from already calculated matrices
+
+    Parameters
+    ----------
+    routes_nodes: List[List[int]]
+        Node indexes of every courier route including start and end depot nodes
+        Example: [[0, 2, 1, 0], [0, 0]]
+    locations: np.ndarray
+        Array of nodes locations in (lat, lon) format with (n, 2) shape
+    duration_matrix: np.ndarray
+        Durations of movement between nodes in seconds with (n, n) shape
+    distance_matrix: Optional[np.ndarray]
+        Road distances between nodes in meters with (n, n) shape. None if they are unknown
+    demands: Optional[np.ndarray]
+        Demand of every node. None if there is no capacity constraint
+    capacities: Optional[List[int]]
+        Capacity of every courier. None if there is no capacity constraint
+    time_windows: Optional[np.ndarray]
+        Time windows of every node with (n, 2) shape. None if there is no time constraint
+    arrival_times: Optional[List[List[int]]]
+        Arrival time for every node of ``routes_nodes`` taken from the solution.
+        None if there is no time constraint, then courier starts at 0 and never waits
+
+    Returns
+    -------
+    List[Dict[str, Union[float, int, None]]]
+        Metrics for every route
+        Example: [{'travel_time': 1200.0, 'haversine_distance_km': 4.1, 'road_distance_m': 5230.0, 'load': 2,
+                   'capacity': 3, 'wait_time': 0.0, 'min_time_window_slack': 340.0}]
+        Times are in seconds. Legs without road (MAX_WEIGHT distance) are not counted in 'road_distance_m'.
+        'min_time_window_slack' is calculated over visited stores with time window, None if there are no such stores
+    """
+    metrics = []
+    for courier_number, nodes in enumerate(routes_nodes):
+        nodes = np.asarray(nodes, dtype=int)
+        from_nodes, to_nodes = nodes[:-1], nodes[1:]
+
+        legs_durations = duration_matrix[from_nodes, to_nodes]
+        route_metric = {
+            'travel_time': float(legs_durations.sum()),
+            'haversine_distance_km': float(haversine_vector(locations[from_nodes], locations[to_nodes]).sum()),
+            'road_distance_m': None
+        }
+        if distance_matrix is not None:
+            legs_distances = distance_matrix[from_nodes, to_nodes]
+            route_metric['road_distance_m'] = float(legs_distances[legs_distances < MAX_WEIGHT].sum())
+
+        if demands is not None:
+            route_metric['load'] = int(demands[nodes].sum())
+            route_metric['capacity'] = capacities[courier_number]
+
+        if arrival_times is not None:
+            arrivals = np.asarray(arrival_times[courier_number], dtype=float)
+            route_metric['wait_time'] = float(np.maximum(np.diff(arrivals) - legs_durations, 0).sum())
+        else:
+            arrivals = np.concatenate([[0], np.cumsum(legs_durations)])
+            route_metric['wait_time'] = 0.
+
+        route_metric['min_time_window_slack'] = None
+        if time_windows is not None and len(nodes) > 2:
+            # stores without time window are open until MAX_WEIGHT, their slack is meaningless
+            windows_ends = time_windows[to_nodes[:-1], 1]
+            with_window = windows_ends < MAX_WEIGHT
+            if with_window.any():
+                route_metric['min_time_window_slack'] = float(
+                    (windows_ends[with_window] - arrivals[1:-1][with_window]).min())
+
+        metrics.append(route_metric)
+
+    return metrics
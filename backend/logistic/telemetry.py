@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import tempfile
+from contextlib import contextmanager
+from collections import defaultdict
+from typing import Callable, Dict, List, Union
+
+
+@contextmanager
+def capture_stderr(output: List[str]):
+    """
+    Capture everything written to stderr file descriptor (including OR-Tools C++ logs) into output list
+
+    Parameters
+    ----------
+    output: List[str]
+        List to which captured lines are appended when the context is closed
+    """
+    sys.stderr.flush()
+    # native code writes to the file descriptor directly, whatever sys.stderr is replaced with
+    stderr_fd = 2
+    saved_fd = os.dup(stderr_fd)
+    with tempfile.TemporaryFile(mode='w+') as capture:
+        os.dup2(capture.fileno(), stderr_fd)
+        try:
+            yield output
+        finally:
+            sys.stderr.flush()
+            os.dup2(saved_fd, stderr_fd)
+            os.close(saved_fd)
+            capture.seek(0)
+            output.extend(capture.read().splitlines())
+
+
+class SolverTelemetry(object):
+
+    def __init__(self):
+        """
+        Class for collecting statistics of OR-Tools search: search log, solution improvement timeline,
+        solver counters and calls of Python callbacks
+        """
+        self.callback_calls = defaultdict(int)
+        self.callback_time = defaultdict(float)
+        self.improvements = []
+        self.search_log = []
+        self.solver_statistics = {}
+        self.start_time = time.perf_counter()
+        # OR-Tools doesn't own Python callbacks, so they are kept alive here until the end of the search
+        self._callbacks = []
+
+    def wrap_callback(self, name: str, callback: Callable) -> Callable:
+        """
+        Wrap callback to count its calls and time spent in it
+
+        Parameters
+        ----------
+        name: str
+            Name of callback in the report. Example: 'time'
+        callback: Callable
+            Transit callback
+
+        Returns
+        -------
+        Callable
+            Callback with the same signature
+        """
+        def wrapped(*args):
+            start = time.perf_counter()
+            try:
+                return callback(*args)
+            finally:
+                self.callback_time[name] += time.perf_counter() - start
+                self.callback_calls[name] += 1
+
+        self._callbacks.append(wrapped)
+        return wrapped
+
+    def solution_callback(self, routing) -> Callable:
+        """
+        Callback for ``RoutingModel.AddAtSolutionCallback`` saving objective of every found solution
+
+        Parameters
+        ----------
+        routing: ortools.constraint_solver.pywrapcp.RoutingModel
+            Routing that is solved
+
+        Returns
+        -------
+        Callable
+        """
+        def on_solution():
+            self.improvements.append({'time': time.perf_counter() - self.start_time,
+                                      'objective': routing.CostVar().Value()})
+
+        self._callbacks.append(on_solution)
+        return on_solution
+
+    def finish(self, routing):
+        """
+        Save solver counters after the search
+
+        Parameters
+        ----------
+        routing: ortools.constraint_solver.pywrapcp.RoutingModel
+            Routing that was solved
+        """
+        solver = routing.solver()
+        self.solver_statistics = {
+            'status': routing.status(),
+            'branches': solver.Branches(),
+            'failures': solver.Failures(),
+            'solutions': solver.Solutions(),
+            'wall_time': solver.WallTime() / 1000,
+            'total_time': time.perf_counter() - self.start_time
+        }
+
+    def report(self) -> Dict[str, Union[Dict, List]]:
+        """
+        Collected statistics in REST format
+
+        Returns
+        -------
+        Dict[str, Union[Dict, List]]
+            Example: {'solver': {'status': 1, 'branches': 120, 'failures': 3, 'solutions': 4, 'wall_time': 0.02,
+                                 'total_time': 0.03},
+                      'callbacks': {'time': {'calls': 350, 'time': 0.001}},
+                      'improvements': [{'time': 0.01, 'objective': 2300}],
+                      'search_log': ['Start search (memory used = 43.17 MB)', ...]}
+        """
+        return {
+            'solver': self.solver_statistics,
+            'callbacks': {name: {'calls': self.callback_calls[name], 'time': self.callback_time[name]}
+                          for name in self.callback_calls},
+            'improvements': self.improvements,
+            'search_log': self.search_log
+        }
@@ -1,7 +1,9 @@
 from haversine import haversine
-from typing import Tuple
+from typing import Tuple, List, Dict
 
-from logistic.config import MODE_TO_SPEED
+import numpy as np
+
+from logistic.config import MODE_TO_SPEED, EARTH_RADIUS
 
 
 def duration_approximation(point_1: Tuple[float, float], point_2: Tuple[float, float], mode: str) -> float:
@@ -26,3 +28,87 @@ def duration_approximation(point_1: Tuple[float, float], point_2: Tuple[float, f
     distance = haversine(point_1, point_2)
     return distance / MODE_TO_SPEED[mode]
 
+
+def haversine_vector(points_1: np.ndarray, points_2: np.ndarray) -> np.ndarray:
+    """
+    Vectorized haversine distance between pairs of points
+
+    Parameters
+    ----------
+    points_1: np.ndarray
+        start points in (lat, lon) format with (n, 2) shape
+    points_2: np.ndarray
+        end points in (lat, lon) format with (n, 2) shape
+
+    Returns
+    -------
+    np.ndarray
+        Distances between points in kilometers with (n,) shape
+
+    """
+    lat_1, lon_1 = np.radians(np.asarray(points_1, dtype=float)).T
+    lat_2, lon_2 = np.radians(np.asarray(points_2, dtype=float)).T
+
+    d = np.sin((lat_2 - lat_1) / 2) ** 2 + np.cos(lat_1) * np.cos(lat_2) * np.sin((lon_2 - lon_1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(d))
+
+
+def haversine_matrix(points: np.ndarray, destinations: np.ndarray = None) -> np.ndarray:
+    """
+    Vectorized haversine distance between every pair of points
+
+    Parameters
+    ----------
+    points: np.ndarray
+        points in (lat, lon) format with (n, 2) shape
+    destinations: np.ndarray
+        points in (lat, lon) format with (m, 2) shape, the same points if it is None
+
+    Returns
+    -------
+    np.ndarray
+        Distances between points and destinations in kilometers with (n, m) shape
+
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    destinations = points if destinations is None else np.asarray(destinations, dtype=float).reshape(-1, 2)
+    n, m = len(points), len(destinations)
+    return haversine_vector(np.repeat(points, m, axis=0), np.tile(destinations, (n, 1))).reshape(n, m)
+
+
+async def add_detailed_routes(solution: Dict[str, List[Dict]],
+                              routing_manager: object,
+                              mode: str
+                              ) -> Dict[str, List[Dict]]:
+    """
+    Query directions for every courier route of a decoded solution
+
+    Parameters
+    ----------
+    solution: Dict[str, List[Dict]]
+        Decoded solution with 'routes' and 'dropped_nodes' keys (see ``LogisticOptimizer.decode_solution``)
+    routing_manager: object
+        Client for the routing API (``logistic.ors.ORS``)
+    mode: str
+        Specifies a transport in routing API format
+
+    Returns
+    -------
+    Dict[str, List[Dict]]
+        The same solution with 'detailed_route' for every route and nodes dropped by directions API
+    """
+    routes = solution['routes']
+    dropped_nodes = solution['dropped_nodes']
+
+    points = [[[coords['lng'], coords['lat']] for coords in obj['route']] for obj in routes]
+
+    detailed_routes, new_drop = await routing_manager.directions_calculation(points, mode)
+    new_drop = [{'lat': node[1], 'lng': node[0]} for node in new_drop]
+    dropped_nodes.extend(new_drop)
+
+    for i, route in enumerate(routes):
+        route['detailed_route'] = [{'lat': p[0], 'lng': p[1]} for p in detailed_routes[i]]
+
+        route['route'] = [coords for coords in route['route'] if coords not in new_drop]
+
+    return solution
@@ -1,57 +1,185 @@
+import os
+import re
 import sys
+import json
+import asyncio
 import logging
+import uuid
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 
 import aiohttp_cors
-import aiohttp_jinja2
-import jinja2
 from aiohttp import web
 import aiohttp
-import pprint
 
-from logistic import LogisticOptimizer
+from logistic.batch import shared_road_weights, solve_problem, problem_mode, warm_up_solver
+from logistic.config import (SOLVER_WORKERS, ORS_WARM_UP_CONNECTIONS, ORS_MAX_CONNECTIONS, ORS_RATE_LIMITS,
+                             LEG_CACHE_SIZE, MATRIX_STORE_DIR)
+from logistic.calibration import MatrixStore
+from logistic.geometry_cache import LegCache
 from logistic.ors import ORS
+from logistic.rate_limit import RateLimiter
+from logistic.utils import add_detailed_routes
 
-from utils import del_none
+from static_files import StaticFiles, Asset, compress, REVALIDATE_CACHE
+from utils import clean_problem, read_problem
 
 logging.basicConfig(stream=sys.stdout, level=logging.ERROR)
 
 routes = web.RouteTableDef()
 
 
+def request_id_of(request) -> str:
+    """
+    Id of the request from X-Request-Id header or a new one.
+    Id is used in names of profiling dumps, so only letters, digits, '-' and '_' are accepted from the header
+    """
+    request_id = request.headers.get('X-Request-Id', '')
+    return request_id if re.fullmatch(r'[\w-]{1,64}', request_id, flags=re.ASCII) else uuid.uuid4().hex
+
+
 @routes.post("/")
 async def main_page(request):
     """
-    Main server for choosing stores set for delivery man
+    Main server for choosing stores set for delivery man.
+    Body can be JSON, msgpack or NPZ with columns of stores info (see ``utils.read_problem``)
 
     """
-    data = await request.json()
-    data = del_none(data)
-    print(data)
+    data = read_problem(await request.read(), request.content_type)
+    request_id = request_id_of(request)
+
+    routing_manager = ORS(request.app['ors_querer'], request.app['ors_limiter'], priority='interactive',
+                          leg_cache=request.app['leg_cache'], matrix_store=request.app['matrix_store'])
+    weights, distances, errors = await shared_road_weights([data], routing_manager)
+    if errors[0] is not None:
+        raise errors[0]
 
-    model = LogisticOptimizer(central_store=data['central_store'],
-                              stores=data['stores'],
-                              couriers=data['couriers'],
-                              routing_manager=ORS(request.app['ors_querer']),
-                              approximation=False)
-    pprint.pprint(model.road_to_weight)
-    result = model.solve()
+    loop = asyncio.get_event_loop()
+    result = await loop.run_in_executor(request.app['solver_pool'], solve_problem,
+                                        data, weights[0], distances[0], request_id)
+    result = await add_detailed_routes(result, routing_manager, problem_mode(data))
 
     return web.json_response(result)
 
 
+@routes.post("/batch")
+async def batch_page(request):
+    """
+    Server for solving many independent problems in one request.
+    Problems are solved in solver worker processes and results are streamed back
+    as NDJSON lines in order of completion: {"index": 0, "result": {...}} or {"index": 0, "error": "..."}
+
+    """
+    data = await request.json()
+    # malformed problems are reported in their lines of the stream
+    problems = [clean_problem(problem) if isinstance(problem, dict) else problem for problem in data['problems']]
+    request_id = request_id_of(request)
+
+    routing_manager = ORS(request.app['ors_querer'], request.app['ors_limiter'], priority='batch',
+                          leg_cache=request.app['leg_cache'], matrix_store=request.app['matrix_store'])
+    weights, distances, errors = await shared_road_weights(problems, routing_manager)
+
+    loop = asyncio.get_event_loop()
+
+    async def solve(index):
+        if errors[index] is not None:
+            return {'index': index, 'error': str(errors[index])}
+        try:
+            result = await loop.run_in_executor(request.app['solver_pool'], solve_problem,
+                                                problems[index], weights[index], distances[index],
+                                                f'{request_id}-{index}')
+            result = await add_detailed_routes(result, routing_manager, problem_mode(problems[index]))
+            return {'index': index, 'result': result}
+        except Exception as e:
+            logging.exception('Problem %s of batch request failed', index)
+            return {'index': index, 'error': str(e)}
+
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+    await response.prepare(request)
+    for line in asyncio.as_completed([solve(index) for index in range(len(problems))]):
+        await response.write((json.dumps(await line) + '\n').encode())
+    await response.write_eof()
+
+    return response
+
+
+@routes.get("/ready")
+async def ready(request):
+    """
+    Readiness of the service: solver workers are started and connections to routing API are opened
+
+    """
+    status = 200 if request.app['state']['ready'] else 503
+    return web.json_response(request.app['state'], status=status)
+
+
+@routes.get("/metrics")
+async def metrics(request):
+    """
+    Service metrics: amount of routing API queries waiting for quota in every endpoint and priority lane
+
+    """
+    return web.json_response({'ors_queue_depth': request.app['ors_limiter'].queue_depth()})
+
+
+@lru_cache(maxsize=None)
+def front_page() -> Asset:
+    # front page is rarely requested, so jinja is imported and the page is rendered only on the first request
+    import jinja2
+    environment = jinja2.Environment(loader=jinja2.FileSystemLoader('templates'))
+    body = environment.get_template('index.html').render().encode()
+    return Asset(body, 'text/html; charset=utf-8', REVALIDATE_CACHE, compress(body))
+
+
 @routes.get("/front")
-@aiohttp_jinja2.template('index.html')
-def front(request):
-    return
+async def front(request):
+    return front_page().response(request)
+
+
+async def warm_up(app):
+    """
+    Start all solver workers (every worker solves a tiny problem on start), open connections to routing API
+    and load static files
+
+    """
+    loop = asyncio.get_event_loop()
+    try:
+        await asyncio.gather(*[loop.run_in_executor(app['solver_pool'], os.getpid) for _ in range(SOLVER_WORKERS)])
+    except Exception:
+        logging.exception('Solver workers warm up failed')
+        return
+    try:
+        await ORS(app['ors_querer']).open_connections(ORS_WARM_UP_CONNECTIONS)
+    except aiohttp.ClientError:
+        logging.exception('Routing API connections warm up failed')
+    await loop.run_in_executor(None, app['static_files'].load)
+    app['state']['ready'] = True
+
+
+async def resources(app):
+    """
+    Create shared resources of the service and warm them up in background,
+    so the service is alive immediately and ready after warm up
+
+    """
+    app['ors_querer'] = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=ORS_MAX_CONNECTIONS))
+    app['ors_limiter'] = RateLimiter(ORS_RATE_LIMITS)
+    app['solver_pool'] = ProcessPoolExecutor(max_workers=SOLVER_WORKERS, initializer=warm_up_solver)
+    warm_up_task = asyncio.ensure_future(warm_up(app))
+
+    yield
+
+    warm_up_task.cancel()
+    await app['ors_querer'].close()
+    app['solver_pool'].shutdown()
 
 
 def main():
     app = web.Application()
+    app['static_files'] = StaticFiles('static')
     app.add_routes(routes)
-    app.add_routes([web.static('/static', 'static')])
+    app.router.add_get('/static/{path:.*}', app['static_files'].handle)
 
-    # routes.static('/static', 'static')
-    aiohttp_jinja2.setup(app, loader=jinja2.FileSystemLoader('templates'))
     cors = aiohttp_cors.setup(app, defaults={
         "*": aiohttp_cors.ResourceOptions(
             allow_credentials=True,
@@ -63,8 +191,11 @@ def main():
     for route in list(app.router.routes()):
         cors.add(route)
     
-    app['ors_querer'] = aiohttp.ClientSession()
-    web.run_app(app)
+    app['state'] = {'ready': False}
+    app['leg_cache'] = LegCache(LEG_CACHE_SIZE)
+    app['matrix_store'] = MatrixStore(MATRIX_STORE_DIR) if MATRIX_STORE_DIR else None
+    app.cleanup_ctx.append(resources)
+    web.run_app(app, port=int(os.environ.get('PORT', 8080)))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,205 @@
+import os
+import re
+import sys
+import io
+import gzip
+import hashlib
+import mimetypes
+from typing import Dict
+
+from aiohttp import web
+
+# file names with content hash generated by the front end build, their content never changes
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8}\.')
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.map', '.txt', '.html', '.json', '.svg')
+# small files are not worth compression
+MIN_COMPRESSION_SIZE = 1024
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+# extensions of pre-compressed files stored next to the original ones
+ENCODING_EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+
+def compress(body: bytes) -> Dict[str, bytes]:
+    """
+    Compress body with every available encoding
+
+    Parameters
+    ----------
+    body: bytes
+        Content to compress
+
+    Returns
+    -------
+    Dict[str, bytes]
+        Compressed content by encoding. Brotli is used only if ``brotli`` package is installed
+    """
+    # zero mtime keeps compressed files reproducible, GzipFile is used since gzip.compress has no mtime before 3.8
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as f:
+        f.write(body)
+    encoded = {'gzip': buffer.getvalue()}
+    try:
+        import brotli  # optional dependency
+    except ImportError:
+        return encoded
+    encoded['br'] = brotli.compress(body)
+    return encoded
+
+
+class Asset(object):
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str, encoded: Dict[str, bytes] = None):
+        """
+        Static content kept in memory with its pre-compressed versions
+
+        Parameters
+        ----------
+        body: bytes
+            Content
+        content_type: str
+            Content-Type header. Example: 'text/html; charset=utf-8'
+        cache_control: str
+            Cache-Control header
+        encoded: Dict[str, bytes]
+            Compressed content by encoding. Example: {'gzip': b'...'}
+        """
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.encoded = encoded or {}
+        self.etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+    def response(self, request: web.Request) -> web.Response:
+        """
+        Response with the best encoding accepted by the client or 304 if client has the same content
+
+        Parameters
+        ----------
+        request: web.Request
+            Request for the asset
+
+        Returns
+        -------
+        web.Response
+        """
+        headers = {'ETag': self.etag, 'Cache-Control': self.cache_control, 'Vary': 'Accept-Encoding'}
+        if self.etag in request.headers.get('If-None-Match', ''):
+            return web.Response(status=304, headers=headers)
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        headers['Content-Type'] = self.content_type
+        for encoding in ENCODING_EXTENSIONS:
+            if encoding in self.encoded and encoding in accepted:
+                headers['Content-Encoding'] = encoding
+                return web.Response(body=self.encoded[encoding], headers=headers)
+        return web.Response(body=self.body, headers=headers)
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """
+    Encodings from Accept-Encoding header, except ones explicitly rejected with q=0
+    """
+    encodings = set()
+    for item in accept_encoding.split(','):
+        encoding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(encoding.strip().lower())
+    return encodings
+
+
+def load_asset(path: str, name: str) -> Asset:
+    """
+    Load file and its compressed versions. Pre-compressed files (see ``precompress``) are used if they exist,
+    otherwise file is compressed in memory
+
+    Parameters
+    ----------
+    path: str
+        Path to the file
+    name: str
+        Name of the file used to choose Cache-Control header
+
+    Returns
+    -------
+    Asset
+    """
+    with open(path, 'rb') as f:
+        body = f.read()
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+        content_type += '; charset=utf-8'
+    cache_control = IMMUTABLE_CACHE if HASHED_NAME.search(name) else REVALIDATE_CACHE
+
+    encoded = {}
+    if name.endswith(COMPRESSIBLE_EXTENSIONS) and len(body) >= MIN_COMPRESSION_SIZE:
+        for encoding, extension in ENCODING_EXTENSIONS.items():
+            if os.path.exists(path + extension):
+                with open(path + extension, 'rb') as f:
+                    encoded[encoding] = f.read()
+        if not encoded:
+            encoded = compress(body)
+    return Asset(body, content_type, cache_control, encoded)
+
+
+class StaticFiles(object):
+
+    def __init__(self, directory: str):
+        """
+        Serving of front end bundle from memory with pre-compressed content, ETags and long caching of hashed files.
+        Files are only listed here, they are loaded with ``load`` (on warm up) or on the first request
+
+        Parameters
+        ----------
+        directory: str
+            Directory with static files
+        """
+        self.paths = {}
+        for root, _, files in os.walk(directory):
+            for file_name in files:
+                if file_name.endswith(tuple(ENCODING_EXTENSIONS.values())):
+                    continue
+                path = os.path.join(root, file_name)
+                self.paths[os.path.relpath(path, directory).replace(os.sep, '/')] = path
+        self.assets = {}
+
+    def load(self):
+        """
+        Load and compress all files
+        """
+        for name, path in self.paths.items():
+            if name not in self.assets:
+                self.assets[name] = load_asset(path, name)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        name = request.match_info['path']
+        if name not in self.paths:
+            raise web.HTTPNotFound()
+        if name not in self.assets:
+            self.assets[name] = load_asset(self.paths[name], name)
+        return self.assets[name].response(request)
+
+
+def precompress(directory: str):
+    """
+    Write gzip (and brotli if available) versions next to compressible files of directory,
+    so the service doesn't compress them on startup. Is supposed to be run on build
+    """
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            if not file_name.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < MIN_COMPRESSION_SIZE:
+                continue
+            with open(path, 'rb') as f:
+                body = f.read()
+            for encoding, content in compress(body).items():
+                with open(path + ENCODING_EXTENSIONS[encoding], 'wb') as f:
+                    f.write(content)
+
+
+if __name__ == '__main__':
+    precompress(sys.argv[1] if len(sys.argv) > 1 else 'static')
@@ -0,0 +1,133 @@
+import os
+import asyncio
+import tempfile
+from unittest import TestCase, mock
+
+from logistic.batch import shared_road_weights, solve_problem
+from logistic.config import MODE_TO_SPEED
+from logistic.utils import duration_approximation
+
+
+class FakeRoutingManager(object):
+
+    def __init__(self):
+        self.queried_points = []
+
+    async def matrix_calculation(self, points, mode, with_distances=False, destinations=None):
+        destinations = points if destinations is None else destinations
+        self.queried_points.append((points, destinations))
+        durations = {(point_1, point_2): duration_approximation(point_1, point_2, 'driving')
+                     for point_1 in points for point_2 in destinations}
+        distances = {key: value * MODE_TO_SPEED['driving'] * 1000 for key, value in durations.items()}
+        return durations, distances if with_distances else None
+
+
+class TestBatch(TestCase):
+
+    def setUp(self):
+        central_store = {'location': (50.45, 30.51)}
+        self.problems = [
+            {'central_store': central_store,
+             'stores': [{'location': (50.46, 30.49)}, {'location': (50.485212, 30.505732)}],
+             'couriers': [{'pid': 0, 'transport': 'driving'}]},
+            {'central_store': central_store,
+             'stores': [{'location': (50.46, 30.49)}, {'location': (50.450190, 30.502826)}],
+             'couriers': [{'pid': 1, 'transport': 'driving'}]}
+        ]
+
+    def test_only_missing_pairs_are_queried(self):
+        routing_manager = FakeRoutingManager()
+        self.problems.append(dict(self.problems[0], stores=self.problems[0]['stores'][::-1]))
+        weights, distances, errors = asyncio.run(shared_road_weights(self.problems, routing_manager))
+
+        depot, shared_store, new_store = (50.45, 30.51), (50.46, 30.49), (50.450190, 30.502826)
+        # the first problem is one square block, the second one shares the depot and a store with it
+        # and the third one has the same locations as the first one
+        self.assertEqual(len(routing_manager.queried_points), 3)
+        self.assertEqual([len(sources) * len(destinations) for sources, destinations in routing_manager.queried_points],
+                         [9, 2, 3])
+        self.assertEqual(routing_manager.queried_points[1], ([depot, shared_store], [new_store]))
+        self.assertEqual(routing_manager.queried_points[2], ([new_store], [depot, shared_store, new_store]))
+        self.assertEqual(errors, [None, None, None])
+        self.assertEqual(weights[0][(0, 1)], weights[1][(0, 1)])
+        self.assertEqual(weights[2][(0, 1)], weights[0][(0, 2)])
+        self.assertEqual(weights[1][(2, 2)], 0)
+        self.assertEqual(weights[1].shape, (3, 3))
+
+    def test_errors_are_reported_per_problem(self):
+        routing_manager = FakeRoutingManager()
+        self.problems.append({'central_store': {'location': (50.45, 30.51)}, 'couriers': []})
+        weights, distances, errors = asyncio.run(shared_road_weights(self.problems, routing_manager))
+
+        self.assertEqual(errors[:2], [None, None])
+        self.assertIsInstance(errors[2], (KeyError, IndexError))
+        self.assertIsNone(weights[2])
+
+        with mock.patch.object(routing_manager, 'matrix_calculation', side_effect=RuntimeError('quota')):
+            weights, distances, errors = asyncio.run(shared_road_weights(self.problems[:2], routing_manager))
+        self.assertEqual([str(error) for error in errors], ['quota', 'quota'])
+
+        # the second problem depends on pairs queried for the first one
+        async def fail_first(points, mode, with_distances=False, destinations=None):
+            if len(points) == 3:
+                raise RuntimeError('quota')
+            return await FakeRoutingManager().matrix_calculation(points, mode, with_distances, destinations)
+
+        self.problems.append({'central_store': {'location': (50.0, 30.0)}, 'stores': [{'location': (50.1, 30.1)}],
+                              'couriers': [{'pid': 3, 'transport': 'driving'}]})
+        with mock.patch.object(routing_manager, 'matrix_calculation', side_effect=fail_first):
+            weights, distances, errors = asyncio.run(shared_road_weights(self.problems, routing_manager))
+        self.assertEqual([str(error) if error else None for error in errors[:2]], ['quota', 'quota'])
+        self.assertIsNone(errors[3])
+        self.assertEqual(weights[3].shape, (2, 2))
+
+    def test_multiple_depots(self):
+        routing_manager = FakeRoutingManager()
+        self.problems[1]['central_store'] = [{'location': (50.45, 30.51)}, {'location': (50.47, 30.52)}]
+        self.problems[1]['couriers'].append({'pid': 2, 'transport': 'driving', 'depot': 1})
+        weights, distances, errors = asyncio.run(shared_road_weights(self.problems, routing_manager))
+
+        self.assertEqual(errors, [None, None])
+        self.assertEqual(weights[1].shape, (4, 4))
+        solution = solve_problem(self.problems[1], weights[1], distances[1])
+        self.assertEqual(solution['dropped_nodes'], [])
+        self.assertEqual(solution['routes'][1]['route'][0], {'lat': 50.47, 'lng': 30.52})
+
+    def test_solve_problem_with_shared_weights(self):
+        weights, distances, errors = asyncio.run(shared_road_weights(self.problems, FakeRoutingManager()))
+        solution = solve_problem(self.problems[1], weights[1], distances[1])
+
+        self.assertEqual(solution['dropped_nodes'], [])
+        self.assertEqual(len(solution['routes'][0]['route']), 3)
+        self.assertNotIn('detailed_route', solution['routes'][0])
+
+    def test_approximation_problem_is_not_queried(self):
+        routing_manager = FakeRoutingManager()
+        self.problems[0]['approximation'] = True
+        weights, distances, errors = asyncio.run(shared_road_weights(self.problems, routing_manager))
+
+        self.assertEqual(len(routing_manager.queried_points), 1)
+        self.assertIsNone(weights[0])
+        solution = solve_problem(self.problems[0], weights[0], distances[0])
+        self.assertEqual(solution['dropped_nodes'], [])
+        self.assertEqual(len(solution['routes'][0]['route']), 3)
+
+    def test_solve_problem_with_metrics(self):
+        self.assertIsNone(asyncio.run(shared_road_weights(self.problems, FakeRoutingManager()))[1][0])
+        # road distances are queried only if some problem asks for metrics
+        self.problems[0]['metrics'] = True
+        weights, distances, errors = asyncio.run(shared_road_weights(self.problems, FakeRoutingManager()))
+        solution = solve_problem(self.problems[0], weights[0], distances[0])
+
+        metric = solution['metrics'][0]
+        self.assertEqual(metric['courier_id'], 0)
+        self.assertAlmostEqual(metric['road_distance_m'] / 1000, metric['haversine_distance_km'], places=6)
+        self.assertAlmostEqual(metric['travel_time'],
+                               metric['haversine_distance_km'] / MODE_TO_SPEED['driving'], places=6)
+
+    def test_solve_problem_profile(self):
+        weights, distances, errors = asyncio.run(shared_road_weights(self.problems, FakeRoutingManager()))
+        self.problems[0]['profile'] = True
+        with tempfile.TemporaryDirectory() as profile_dir, mock.patch('logistic.batch.PROFILE_DIR', profile_dir):
+            solve_problem(self.problems[0], weights[0], distances[0], 'abc')
+            self.assertTrue(os.path.exists(os.path.join(profile_dir, 'abc.prof')))
@@ -0,0 +1,67 @@
+import json
+import tempfile
+from unittest import TestCase, mock
+
+import numpy as np
+
+from logistic import calibration
+from logistic.calibration import MatrixStore, SpeedModel, fit_speed_model, duration_matrix_approximation
+from logistic.config import MODE_TO_SPEED
+from logistic.utils import haversine_matrix, duration_approximation
+
+
+class TestCalibration(TestCase):
+
+    def setUp(self):
+        calibration.speed_models.cache_clear()
+        self.points = np.array([(50.45, 30.51), (50.46, 30.49), (50.485212, 30.505732), (50.450190, 30.502826)])
+
+    def tearDown(self):
+        calibration.speed_models.cache_clear()
+
+    def test_haversine_matrix(self):
+        distances = haversine_matrix(self.points)
+        self.assertEqual(distances.shape, (4, 4))
+        self.assertAlmostEqual(distances[0, 2], duration_approximation(self.points[0], self.points[2], 'driving')
+                               * MODE_TO_SPEED['driving'])
+        np.testing.assert_allclose(distances, distances.T)
+
+    def test_default_approximation(self):
+        durations = duration_matrix_approximation(self.points, 'driving')
+        np.testing.assert_allclose(durations, haversine_matrix(self.points) / MODE_TO_SPEED['driving'])
+
+    def test_fit_recovers_speed(self):
+        speed = 0.01
+        with tempfile.TemporaryDirectory() as directory:
+            store = MatrixStore(directory)
+            durations = haversine_matrix(self.points) / speed
+            durations[0, 1] = np.nan
+            store.save(self.points.tolist(), self.points.tolist(), durations, 'driving-car')
+            # rows of a matrix to some of points
+            store.save(self.points[:2].tolist(), self.points[2:].tolist(),
+                       haversine_matrix(self.points[:2], self.points[2:]) / speed, 'driving-car')
+            self.assertEqual(store.modes(), ['driving-car'])
+            model = fit_speed_model(store.matrices('driving-car'), default_speed=1, min_cell_samples=1)
+
+        np.testing.assert_allclose(model.band_speeds[:2], speed)
+        # there are no samples of long distances
+        self.assertEqual(model.band_speeds[-1], 1)
+        np.testing.assert_allclose(model.duration_matrix(self.points), haversine_matrix(self.points) / speed)
+
+    def test_calibrated_approximation(self):
+        model = SpeedModel(band_speeds=[0.005, 0.01, 0.01, 0.01, 0.01],
+                           cell_speeds={(1009, 610): [0.002, None, None, None, None]})
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump({'driving-car': model.to_dict()}, f)
+            f.flush()
+            with mock.patch.object(calibration, 'SPEED_MODEL_PATH', f.name):
+                durations = duration_matrix_approximation(self.points, 'driving')
+
+        distances = haversine_matrix(self.points)
+        cells = model.cells(self.points).tolist()
+        for i, j in [(0, 3), (1, 2), (2, 0)]:
+            if distances[i, j] >= 1:
+                speed = 0.01
+            else:
+                speed = 0.002 if tuple(cells[i]) == (1009, 610) else 0.005
+            self.assertAlmostEqual(durations[i, j], distances[i, j] / speed)
@@ -0,0 +1,67 @@
+import time
+from unittest import TestCase
+
+import numpy as np
+
+from logistic.config import MAX_WEIGHT
+from logistic.feasibility import infeasible_nodes
+from logistic.logistic_optimizer import LogisticOptimizer
+
+
+class TestFeasibility(TestCase):
+
+    def test_infeasible_nodes(self):
+        durations = np.full((5, 5), 10.0)
+        durations[0, 3] = MAX_WEIGHT
+        durations[1, 4] = 100.0
+        time_windows = np.array([[0, 1000], [0, MAX_WEIGHT], [0, 50], [0, MAX_WEIGHT], [0, 50]], dtype=np.int64)
+
+        reasons = infeasible_nodes(durations, amount_of_depots=1, starts=[0], ends=[0],
+                                   demands=np.array([0, 5, 1, 1, 1]), capacities=[2, 3], time_windows=time_windows)
+        self.assertEqual(reasons, {1: 'capacity', 3: 'unreachable'})
+
+        durations[0, 4] = 60.0
+        reasons = infeasible_nodes(durations, amount_of_depots=1, starts=[0], ends=[0], time_windows=time_windows)
+        self.assertEqual(reasons, {3: 'unreachable', 4: 'time_window'})
+
+    def test_reasons_precedence(self):
+        durations = np.full((4, 4), 10.0)
+        durations[0, 1:] = MAX_WEIGHT
+        time_windows = np.array([[0, 1000], [0, 5], [0, 5], [0, MAX_WEIGHT]], dtype=np.int64)
+
+        reasons = infeasible_nodes(durations, amount_of_depots=1, starts=[0], ends=[0],
+                                   demands=np.array([0, 5, 1, 5]), capacities=[2], time_windows=time_windows)
+        self.assertEqual(reasons, {1: 'capacity', 2: 'unreachable', 3: 'capacity'})
+
+    def test_solution_reports_infeasible_stores(self):
+        unix_time = int(time.time())
+        stores = [{'location': (50.46, 30.49), "demand": 1, 'time_window': [unix_time, unix_time + 2000000]},
+                  {'location': (50.485212, 30.505732), "demand": 3},
+                  {'location': (50.450190, 30.502826), "demand": 1, 'time_window': [unix_time, unix_time + 60]}]
+        model = LogisticOptimizer(central_store={'location': (50.45, 30.51)},
+                                  stores=stores,
+                                  couriers=[{'pid': i, 'transport': 'bicycling', 'capacity': 2} for i in range(2)])
+        solution = model.solve(with_metrics=True)
+
+        self.assertEqual(solution['dropped_nodes'],
+                         [{'lat': 50.485212, 'lng': 30.505732, 'reason': 'capacity'},
+                          {'lat': 50.450190, 'lng': 30.502826, 'reason': 'time_window'}])
+        self.assertEqual(len(model.total_locations), 2)
+        self.assertEqual(sorted(len(route['route']) for route in solution['routes']), [1, 2])
+        self.assertEqual(sum(metric['load'] for metric in solution['metrics']), 1)
+
+    def test_infeasible_store_at_depot_keeps_depot_in_route(self):
+        class FakeRoutingManager(object):
+
+            async def directions_calculation(self, points, mode):
+                return points, []
+
+        stores = [{'location': (50.45, 30.51), "demand": 5}, {'location': (50.46, 30.49), "demand": 1}]
+        model = LogisticOptimizer(central_store={'location': (50.45, 30.51)},
+                                  stores=stores,
+                                  couriers=[{'pid': 0, 'transport': 'driving', 'capacity': 2}],
+                                  routing_manager=FakeRoutingManager())
+        solution = model.solve()
+
+        self.assertEqual(solution['dropped_nodes'], [{'lat': 50.45, 'lng': 30.51, 'reason': 'capacity'}])
+        self.assertEqual(solution['routes'][0]['route'], [{'lat': 50.45, 'lng': 30.51}, {'lat': 50.46, 'lng': 30.49}])
@@ -0,0 +1,57 @@
+import asyncio
+from unittest import TestCase, mock
+
+from logistic.geometry_cache import LegCache
+from logistic.ors import ORS
+
+
+class FakeORS(ORS):
+
+    def __init__(self, leg_cache):
+        super().__init__(None, leg_cache=leg_cache)
+        self.queried_points = []
+
+    async def call_api(self, points, ref, mode):
+        """
+        Straight line directions with the middle point on every leg, geometry is returned not encoded
+        """
+        self.queried_points.append(points)
+        coordinates, way_points = [points[0]], [0]
+        for from_point, to_point in zip(points[:-1], points[1:]):
+            coordinates.append([(from_point[0] + to_point[0]) / 2, (from_point[1] + to_point[1]) / 2])
+            coordinates.append(to_point)
+            way_points.append(len(coordinates) - 1)
+        return {'response': {'routes': [{'geometry': {'coordinates': coordinates},
+                                         'way_points': way_points,
+                                         'segments': [{'duration': 1}] * (len(points) - 1)}]},
+                'dropped_nodes': []}
+
+
+@mock.patch('openrouteservice.convert.decode_polyline', lambda geometry: geometry)
+class TestLegCache(TestCase):
+
+    def test_only_uncached_legs_are_queried(self):
+        cache = LegCache(max_size=100)
+        first_plan = FakeORS(cache)
+        routes, dropped_nodes = asyncio.run(
+            first_plan.directions_calculation([[[0, 0], [0, 2], [2, 2]], [[0, 0]]], 'driving-car'))
+
+        self.assertEqual(routes, [[[0, 0], [1, 0], [2, 0], [2, 1], [2, 2]], []])
+        self.assertEqual(dropped_nodes, [])
+        self.assertEqual(len(cache), 2)
+
+        second_plan = FakeORS(cache)
+        routes, _ = asyncio.run(second_plan.directions_calculation([[[0, 0], [0, 2], [4, 4], [2, 2]]], 'driving-car'))
+
+        self.assertEqual(second_plan.queried_points, [[[0, 2], [4, 4], [2, 2]]])
+        self.assertEqual(routes, [[[0, 0], [1, 0], [2, 0], [3, 2], [4, 4], [3, 3], [2, 2]]])
+
+    def test_least_recently_used_leg_is_evicted(self):
+        cache = LegCache(max_size=2)
+        cache.put((0, 0), (1, 1), 'driving-car', [[0, 0], [1, 1]], 1)
+        cache.put((1, 1), (2, 2), 'driving-car', [[1, 1], [2, 2]], 1)
+        cache.get((0, 0), (1, 1), 'driving-car')
+        cache.put((2, 2), (3, 3), 'driving-car', [[2, 2], [3, 3]], 1)
+
+        self.assertIsNotNone(cache.get((0, 0), (1, 1), 'driving-car'))
+        self.assertIsNone(cache.get((1, 1), (2, 2), 'driving-car'))
@@ -193,3 +193,112 @@ class TestLogisticOptimizer(TestCase):
         start_time = time.time()
         solution = model.solve()
         self.assertTrue(time.time() - start_time < 1.5)
+
+    def test_stores_columns(self):
+        central_store = {'location': (50.45, 30.51)}
+        unix_time = int(time.time())
+
+        records = [{'location': (50.46, 30.49), "demand": 1, 'time_window': [unix_time, unix_time + 2000000]},
+                   {'location': (50.485212, 30.505732), "demand": 3},
+                   {'location': (50.450190, 30.502826), "demand": 1, 'time_window': [unix_time, unix_time + 60]}]
+        columns = {'lat': [50.46, 50.485212, 50.450190], 'lon': [30.49, 30.505732, 30.502826], 'demand': [1, 3, 1],
+                   'tw_start': [unix_time, None, unix_time], 'tw_end': [unix_time + 2000000, None, unix_time + 60]}
+        couriers = [{'pid': i, 'transport': 'bicycling', 'capacity': 2} for i in range(2)]
+
+        records_model = LogisticOptimizer(central_store=central_store, stores=records, couriers=couriers)
+        columns_model = LogisticOptimizer(central_store=central_store, stores=columns, couriers=couriers)
+
+        self.assertEqual(columns_model.stores_demands, records_model.stores_demands)
+        self.assertEqual(columns_model.time_windows[1:], records_model.time_windows[1:])
+        self.assertEqual(columns_model.solve(), records_model.solve())
+
+    def test_instrumentation(self):
+        central_store = {'location': (50.45, 30.51)}
+
+        locations = [{'location': (50.46, 30.49), "demand": 1}, {'location': (50.485212, 30.505732), "demand": 1}]
+
+        model = LogisticOptimizer(central_store=central_store,
+                                  stores=locations,
+                                  couriers=[{'pid': i, 'transport': 'bicycling', 'capacity': 2} for i in range(2)])
+        telemetry = model.solve(instrumentation=True)['telemetry']
+
+        self.assertTrue(telemetry['improvements'])
+        self.assertTrue(telemetry['search_log'])
+        self.assertTrue(telemetry['callbacks']['time']['calls'] > 0)
+        self.assertTrue(telemetry['callbacks']['demand']['calls'] > 0)
+        self.assertTrue(telemetry['solver']['branches'] > 0)
+
+    def test_multiple_depots(self):
+        depots = [{'location': (50.45, 30.51)}, {'location': (50.52, 30.62)}]
+        stores = [{'location': (50.46, 30.49), "demand": 1}, {'location': (50.450190, 30.502826), "demand": 1},
+                  {'location': (50.515, 30.61), "demand": 1}, {'location': (50.525, 30.63), "demand": 1}]
+        couriers = [{'pid': 0, 'transport': 'driving', 'capacity': 2, 'depot': 0},
+                    {'pid': 1, 'transport': 'driving', 'capacity': 2, 'depot': 1}]
+
+        result = LogisticOptimizer(central_store=depots, stores=stores, couriers=couriers).solve(with_metrics=True)
+
+        self.assertEqual(result['dropped_nodes'], [])
+        self.assertEqual(result['routes'][0]['route'][0], {'lat': 50.45, 'lng': 30.51})
+        self.assertEqual({(point['lat'], point['lng']) for point in result['routes'][0]['route'][1:]},
+                         {(50.46, 30.49), (50.450190, 30.502826)})
+        self.assertEqual(result['routes'][1]['route'][0], {'lat': 50.52, 'lng': 30.62})
+        self.assertEqual({(point['lat'], point['lng']) for point in result['routes'][1]['route'][1:]},
+                         {(50.515, 30.61), (50.525, 30.63)})
+
+    def test_multiple_depots_end_depot_and_unused_depot(self):
+        depots = [{'location': (50.45, 30.51)}, {'location': (50.52, 30.62)}, {'location': (50.40, 30.40)}]
+        stores = [{'location': (50.46, 30.49)}, {'location': (50.515, 30.61)}]
+        couriers = [{'pid': 0, 'transport': 'driving', 'depot': 0, 'end_depot': 1}]
+
+        result = LogisticOptimizer(central_store=depots, stores=stores, couriers=couriers).solve()
+
+        self.assertEqual(result['dropped_nodes'], [])
+        self.assertEqual(result['routes'][0]['route'],
+                         [{'lat': 50.45, 'lng': 30.51}, {'lat': 50.46, 'lng': 30.49},
+                          {'lat': 50.515, 'lng': 30.61}, {'lat': 50.52, 'lng': 30.62}])
+
+    def test_store_at_depot_location(self):
+        class FakeRoutingManager(object):
+
+            async def matrix_calculation(self, points, mode, with_distances=False):
+                # routing API returns zeros on the diagonal
+                durations = {(point_1, point_2): 0 if point_1 == point_2 else 100
+                             for point_1 in points for point_2 in points}
+                return durations, durations
+
+            async def directions_calculation(self, points, mode):
+                return points, []
+
+        central_store = {'location': (50.45, 30.51)}
+        stores = [{'location': (50.45, 30.51)}, {'location': (50.46, 30.49)}]
+        model = LogisticOptimizer(central_store=central_store, stores=stores,
+                                  couriers=[{'pid': 0, 'transport': 'driving'}],
+                                  routing_manager=FakeRoutingManager(), approximation=False)
+        result = model.solve()
+
+        self.assertEqual(model.duration_matrix[0, 1], 0)
+        self.assertEqual(model.distance_matrix[1, 0], 0)
+        self.assertEqual(result['dropped_nodes'], [])
+        self.assertEqual(len(result['routes'][0]['route']), 3)
+
+    def test_courier_depot_out_of_depots(self):
+        depots = [{'location': (50.45, 30.51)}, {'location': (50.52, 30.62)}]
+        stores = [{'location': (50.46, 30.49)}, {'location': (50.515, 30.61)}]
+
+        for courier in [{'pid': 0, 'transport': 'driving', 'depot': 2},
+                        {'pid': 0, 'transport': 'driving', 'depot': 0, 'end_depot': -1}]:
+            with self.assertRaises(ValueError):
+                LogisticOptimizer(central_store=depots, stores=stores, couriers=[courier])
+
+    def test_end_depot_time_window(self):
+        unix_time = int(time.time())
+        depots = [{'location': (50.45, 30.51), 'time_window': [unix_time, unix_time + 10]},
+                  {'location': (50.46, 30.51), 'time_window': [unix_time, unix_time + 600]}]
+        stores = [{'location': (50.455, 30.51)}, {'location': (50.60, 30.51)}]
+        couriers = [{'pid': 0, 'transport': 'driving', 'depot': 0, 'end_depot': 1}]
+
+        result = LogisticOptimizer(central_store=depots, stores=stores, couriers=couriers).solve()
+
+        # the far store can't be visited before the end depot closes
+        self.assertEqual(result['dropped_nodes'], [{'lat': 50.60, 'lng': 30.51}])
+        self.assertEqual(result['routes'][0]['route'][1], {'lat': 50.455, 'lng': 30.51})
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+from unittest import TestCase, mock
+
+from logistic.config import ORS_MAX_RETRY_WAIT
+from logistic.ors import ORS
+from logistic.rate_limit import RateLimiter
+
+
+class MatrixORS(ORS):
+
+    def __init__(self):
+        super().__init__(async_session=None)
+        self.queried_sources = []
+        self.queried_metrics = []
+
+    async def fetch(self, client, points, ref, mode, sources=None, destinations=None, metrics=None):
+        self.queried_sources.append(sources if destinations is None else (sources, destinations))
+        self.queried_metrics.append(metrics)
+        sources = range(len(points)) if sources is None else sources
+        destinations = range(len(points)) if destinations is None else destinations
+        matrix = [[abs(i - j) for j in destinations] for i in sources]
+        return {'response': {'durations': matrix, 'distances': matrix}, 'dropped_nodes': []}
+
+
+class FakeResponse(object):
+
+    def __init__(self, body, status=200, headers=None):
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def json(self, content_type=None):
+        size = len(self.body['locations'])
+        return {'durations': [[1] * size] * size, 'distances': [[1] * size] * size}
+
+
+class FakeSession(object):
+
+    def post(self, url, json, headers):
+        return FakeResponse(json)
+
+
+class QuotaSession(FakeSession):
+
+    def __init__(self):
+        self.rejected = False
+
+    def post(self, url, json, headers):
+        if self.rejected:
+            return FakeResponse(json)
+        self.rejected = True
+        return FakeResponse(json, status=429, headers={'Retry-After': '3600'})
+
+
+class TestORS(TestCase):
+
+    def test_matrix_is_queried_by_blocks(self):
+        points = [(50.4 + i / 100, 30.5) for i in range(5)]
+        routing_manager = MatrixORS()
+
+        with mock.patch('logistic.ors.ORS_MATRIX_MAX_ELEMENTS', 10):
+            durations, distances = asyncio.run(routing_manager.matrix_calculation(points, 'driving-car', True))
+
+        self.assertEqual(routing_manager.queried_sources, [([0, 1], [0, 1, 2, 3, 4]), ([2, 3], [0, 1, 2, 3, 4]),
+                                                           ([4], [0, 1, 2, 3, 4])])
+        self.assertEqual(routing_manager.queried_metrics, [['duration', 'distance']] * 3)
+        self.assertEqual(durations[(points[4], points[1])], 3)
+        self.assertEqual(distances[(points[0], points[3])], 3)
+
+    def test_matrix_to_destinations(self):
+        points = [(50.4 + i / 100, 30.5) for i in range(5)]
+        routing_manager = MatrixORS()
+
+        with mock.patch('logistic.ors.ORS_MATRIX_MAX_ELEMENTS', 2):
+            durations, _ = asyncio.run(routing_manager.matrix_calculation(points[:2], 'driving-car',
+                                                                          destinations=points[1:4]))
+
+        self.assertEqual(routing_manager.queried_sources, [([0], [1, 2]), ([0], [3]), ([1], [1, 2]), ([1], [3])])
+        self.assertEqual(len(durations), 6)
+        self.assertEqual(durations[(points[0], points[3])], 3)
+        self.assertEqual(durations[(points[1], points[1])], 0)
+
+    def test_small_matrix_is_queried_at_once(self):
+        points = [(50.4 + i / 100, 30.5) for i in range(3)]
+        routing_manager = MatrixORS()
+        durations, distances = asyncio.run(routing_manager.matrix_calculation(points, 'driving-car'))
+
+        self.assertEqual(routing_manager.queried_sources, [None])
+        # distances are queried only for metrics
+        self.assertEqual(routing_manager.queried_metrics, [['duration']])
+        self.assertIsNone(distances)
+
+    @mock.patch.dict('os.environ', {'ORS_API_KEY': 'key'})
+    def test_interactive_query_is_not_blocked_by_batch(self):
+        points = [(50.4 + i / 100, 30.5) for i in range(3)]
+
+        async def scenario():
+            limiter = RateLimiter({'matrix': (20, 1), 'directions': (20, 1)})
+            session = FakeSession()
+            finished = []
+
+            async def query(name, priority, delay):
+                await asyncio.sleep(delay)
+                for _ in range(2):
+                    await ORS(session, limiter, priority=priority).matrix_calculation(points, 'driving-car')
+                finished.append(name)
+
+            await asyncio.gather(query('batch', 'batch', 0), query('batch', 'batch', 0),
+                                 query('interactive', 'interactive', 0.01))
+            return finished
+
+        self.assertEqual(asyncio.run(scenario())[0], 'interactive')
+
+    @mock.patch.dict('os.environ', {'ORS_API_KEY': 'key'})
+    def test_retry_after_is_clamped(self):
+        points = [(50.4 + i / 100, 30.5) for i in range(3)]
+        with mock.patch('logistic.ors.asyncio.sleep', new=mock.AsyncMock()) as sleep:
+            asyncio.run(ORS(QuotaSession()).matrix_calculation(points, 'driving-car'))
+
+        sleep.assert_awaited_once_with(ORS_MAX_RETRY_WAIT)
+
+    def test_matrix_is_stored_out_of_event_loop(self):
+        points = [(50.4 + i / 100, 30.5) for i in range(3)]
+        routing_manager = MatrixORS()
+        routing_manager.matrix_store = mock.Mock()
+        loop_thread = []
+
+        async def scenario():
+            loop_thread.append(threading.get_ident())
+            await routing_manager.matrix_calculation(points, 'driving-car')
+
+        routing_manager.matrix_store.save.side_effect = lambda *args: loop_thread.append(threading.get_ident())
+        asyncio.run(scenario())
+
+        self.assertEqual(len(loop_thread), 2)
+        self.assertNotEqual(loop_thread[0], loop_thread[1])
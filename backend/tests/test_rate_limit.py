@@ -0,0 +1,36 @@
+import asyncio
+from unittest import TestCase
+
+from logistic.rate_limit import TokenBucket, RateLimiter
+
+
+class TestRateLimit(TestCase):
+
+    def test_interactive_queries_preempt_batch(self):
+        async def scenario():
+            bucket = TokenBucket(rate=50, capacity=1)
+            served = []
+
+            async def query(name, priority):
+                await bucket.acquire(priority)
+                served.append(name)
+
+            await bucket.acquire('batch')  # burst is used up, next queries wait
+            tasks = [asyncio.ensure_future(query('batch_1', 'batch')),
+                     asyncio.ensure_future(query('batch_2', 'batch'))]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.ensure_future(query('interactive', 'interactive')))
+            await asyncio.sleep(0)
+            depth = bucket.queue_depth()
+            await asyncio.gather(*tasks)
+            return served, depth
+
+        served, depth = asyncio.new_event_loop().run_until_complete(scenario())
+
+        self.assertEqual(depth, {'interactive': 1, 'batch': 2})
+        self.assertEqual(served, ['interactive', 'batch_1', 'batch_2'])
+
+    def test_limiter_queue_depth(self):
+        limiter = RateLimiter({'matrix': (1, 5), 'directions': (1, 5)})
+        self.assertEqual(limiter.queue_depth(), {'matrix': {'interactive': 0, 'batch': 0},
+                                                 'directions': {'interactive': 0, 'batch': 0}})
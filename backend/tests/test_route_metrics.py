@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+import numpy as np
+
+from logistic.config import MAX_WEIGHT
+from logistic.metrics import calculate_routes_distance
+from logistic.route_metrics import route_metrics
+
+
+class TestRouteMetrics(TestCase):
+
+    def setUp(self):
+        self.locations = np.array([(50.45, 30.51), (50.46, 30.49), (50.485212, 30.505732)])
+        self.duration_matrix = np.array([[0, 10, 20],
+                                         [10, 0, 15],
+                                         [20, 15, 0]])
+
+    def test_travel_time_and_load(self):
+        metrics = route_metrics(routes_nodes=[[0, 1, 2, 0], [0, 0]],
+                                locations=self.locations,
+                                duration_matrix=self.duration_matrix,
+                                demands=np.array([0, 1, 2]),
+                                capacities=[3, 1])
+
+        self.assertEqual(metrics[0]['travel_time'], 45)
+        self.assertEqual(metrics[0]['load'], 3)
+        self.assertEqual(metrics[0]['capacity'], 3)
+        self.assertEqual(metrics[0]['wait_time'], 0)
+        self.assertIsNone(metrics[0]['road_distance_m'])
+        self.assertIsNone(metrics[0]['min_time_window_slack'])
+        self.assertEqual(metrics[1]['travel_time'], 0)
+        self.assertEqual(metrics[1]['haversine_distance_km'], 0)
+        self.assertEqual(metrics[1]['load'], 0)
+
+    def test_wait_time_and_slack(self):
+        metrics = route_metrics(routes_nodes=[[0, 1, 2, 0]],
+                                locations=self.locations,
+                                duration_matrix=self.duration_matrix,
+                                time_windows=np.array([[0, 100], [30, 50], [0, 60]]),
+                                arrival_times=[[0, 30, 45, 65]])
+
+        self.assertEqual(metrics[0]['wait_time'], 20)
+        self.assertEqual(metrics[0]['min_time_window_slack'], 15)
+
+    def test_stores_without_window_and_unreachable_legs(self):
+        distance_matrix = np.array([[0, 1000, MAX_WEIGHT],
+                                    [1000, 0, 500],
+                                    [MAX_WEIGHT, 500, 0]], dtype=np.int64)
+        metrics = route_metrics(routes_nodes=[[0, 1, 2, 0], [0, 2, 0]],
+                                locations=self.locations,
+                                duration_matrix=self.duration_matrix,
+                                distance_matrix=distance_matrix,
+                                time_windows=np.array([[0, 100], [0, 50], [0, MAX_WEIGHT]], dtype=np.int64),
+                                arrival_times=[[0, 10, 25, 45], [0, 20, 40]])
+
+        self.assertEqual(metrics[0]['road_distance_m'], 1500)
+        self.assertEqual(metrics[0]['min_time_window_slack'], 40)
+        self.assertIsNone(metrics[1]['min_time_window_slack'])
+
+    def test_routes_distances_are_not_accumulated(self):
+        distances = calculate_routes_distance([[(0, 0), (1, 1)], [(0, 0), (1, 1)]])
+        self.assertEqual(distances[0], distances[1])
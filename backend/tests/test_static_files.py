@@ -0,0 +1,39 @@
+import os
+import gzip
+import tempfile
+from unittest import TestCase
+
+from aiohttp.test_utils import make_mocked_request
+
+from static_files import load_asset, accepted_encodings, IMMUTABLE_CACHE, REVALIDATE_CACHE
+
+
+class TestStaticFiles(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.content = b'console.log("delivery");' * 100
+        for name in ('main.5cf2314f.chunk.js', 'manifest.json'):
+            with open(os.path.join(self.directory.name, name), 'wb') as f:
+                f.write(self.content)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hashed_file_is_immutable_and_compressed(self):
+        asset = load_asset(os.path.join(self.directory.name, 'main.5cf2314f.chunk.js'), 'main.5cf2314f.chunk.js')
+        response = asset.response(make_mocked_request('GET', '/', headers={'Accept-Encoding': 'gzip, deflate'}))
+
+        self.assertEqual(response.headers['Cache-Control'], IMMUTABLE_CACHE)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.body), self.content)
+
+    def test_not_modified(self):
+        asset = load_asset(os.path.join(self.directory.name, 'manifest.json'), 'manifest.json')
+        response = asset.response(make_mocked_request('GET', '/', headers={'If-None-Match': asset.etag}))
+
+        self.assertEqual(asset.cache_control, REVALIDATE_CACHE)
+        self.assertEqual(response.status, 304)
+
+    def test_rejected_encodings(self):
+        self.assertEqual(accepted_encodings('gzip;q=0, br'), {'br'})
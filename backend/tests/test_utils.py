@@ -0,0 +1,33 @@
+import io
+import json
+from unittest import TestCase
+
+import numpy as np
+
+from utils import read_problem
+
+
+class TestUtils(TestCase):
+
+    def test_read_npz_problem(self):
+        body = io.BytesIO()
+        np.savez(body,
+                 problem=json.dumps({'central_store': {'location': [50.45, 30.51]},
+                                     'couriers': [{'pid': 0, 'transport': 'driving', 'capacity': None}]}),
+                 lat=np.array([50.46, 50.47]), lon=np.array([30.49, 30.5]), demand=np.array([1, 2]))
+
+        problem = read_problem(body.getvalue(), 'application/x-npz')
+
+        self.assertEqual(problem['couriers'], [{'pid': 0, 'transport': 'driving'}])
+        self.assertEqual(sorted(problem['stores']), ['demand', 'lat', 'lon'])
+        np.testing.assert_array_equal(problem['stores']['demand'], [1, 2])
+
+    def test_read_json_columns_keep_none(self):
+        body = json.dumps({'central_store': {'location': [50.45, 30.51], 'time_window': None},
+                           'couriers': [{'pid': 0, 'transport': 'driving'}],
+                           'stores': {'lat': [50.46], 'lon': [30.49], 'tw_end': [None]}}).encode()
+
+        problem = read_problem(body, 'application/json')
+
+        self.assertEqual(problem['central_store'], {'location': [50.45, 30.51]})
+        self.assertEqual(problem['stores']['tw_end'], [None])
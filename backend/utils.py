@@ -1,5 +1,12 @@
+import io
+import json
 from typing import Union
 
+import numpy as np
+
+# columns of stores info in columnar problems
+STORES_COLUMNS = ('lat', 'lon', 'demand', 'tw_start', 'tw_end')
+
 
 def del_none(d: Union[dict, list]):
     """
@@ -19,3 +26,38 @@ def del_none(d: Union[dict, list]):
         for value in d:
             del_none(value)
     return d
+
+
+def clean_problem(problem: dict) -> dict:
+    """
+    Delete ``None`` values from a problem. Columns of stores info are left as is,
+    since None there marks missing time window and walking through big columns is slow.
+
+    This alters the input so you may wish to ``copy`` the dict first.
+    """
+    stores = problem.pop('stores', None)
+    del_none(problem)
+    problem['stores'] = stores if isinstance(stores, dict) else del_none(stores)
+    return problem
+
+
+def read_problem(body: bytes, content_type: str) -> dict:
+    """
+    Read a problem from request body.
+
+    Supported content types:
+        application/json: problem dict, stores can be a list of dicts or columns (see ``LogisticOptimizer``)
+        application/msgpack: the same dict as for JSON, packed with msgpack
+        application/x-npz: numpy ``savez`` archive with stores columns as arrays
+            and 'problem' string array with JSON of the rest of the problem ('central_store', 'couriers' etc.)
+    """
+    if content_type == 'application/x-npz':
+        with np.load(io.BytesIO(body), allow_pickle=False) as archive:
+            problem = json.loads(str(archive['problem']))
+            problem['stores'] = {column: archive[column] for column in STORES_COLUMNS if column in archive.files}
+    elif content_type == 'application/msgpack':
+        import msgpack  # optional dependency, needed only for msgpack bodies
+        problem = msgpack.unpackb(body)
+    else:
+        problem = json.loads(body)
+    return clean_problem(problem)